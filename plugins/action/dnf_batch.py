@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_text
+from ansible.module_utils.six import string_types
+from ansible.plugins.action import ActionBase
+
+# dnf options that are forwarded unchanged to every transaction
+DNF_PASSTHROUGH_ARGS = (
+    'disable_gpg_check',
+    'skip_broken',
+    'enablerepo',
+    'disablerepo',
+    'cacheonly',
+)
+
+# Prints each spec that is already satisfied by an installed package, one per line
+RPM_PROVIDES_SCRIPT = 'for p in "$@"; do rpm -q --quiet --whatprovides "$p" && printf "%s\\n" "$p"; done; exit 0'
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('name', 'state') + DNF_PASSTHROUGH_ARGS)
+
+    def _normalize_names(self, names):
+        if isinstance(names, string_types):
+            names = names.split(',')
+        if not isinstance(names, list):
+            raise AnsibleActionFail("'name' must be a list of package specs")
+
+        # Package lists in this collection contain duplicates; keep first occurrence order
+        seen = set()
+        unique = []
+        for name in names:
+            name = to_text(name).strip()
+            if name and name not in seen:
+                seen.add(name)
+                unique.append(name)
+        return unique
+
+    def _query_present(self, names, task_vars):
+        """Return the subset of specs already provided by installed packages (one remote call)."""
+        result = self._execute_module(
+            module_name='ansible.legacy.command',
+            module_args={'argv': ['/bin/sh', '-c', RPM_PROVIDES_SCRIPT, 'rpm-query'] + names},
+            task_vars=task_vars,
+        )
+        if result.get('failed') or result.get('skipped'):
+            # rpm unavailable or check mode; let dnf decide what is missing
+            return set()
+        return set(result.get('stdout', '').splitlines())
+
+    def _transaction(self, names, state, dnf_args, task_vars):
+        self._transactions += 1
+        module_args = dict(dnf_args, name=names, state=state)
+        return self._execute_module(
+            module_name='ansible.legacy.dnf',
+            module_args=module_args,
+            task_vars=task_vars,
+        )
+
+    def _install(self, names, state, dnf_args, task_vars):
+        """Install names in one transaction, isolating failing specs by bisection.
+
+        Returns a tuple of (changed, unchanged, failures): the specs handled by
+        transactions that changed the host, the specs handled by no-op transactions,
+        and a mapping of each failing spec to the error dnf reported for it.
+        """
+        result = self._transaction(names, state, dnf_args, task_vars)
+        if not result.get('failed'):
+            if result.get('changed'):
+                return list(names), [], {}
+            return [], list(names), {}
+
+        msg = to_text(result.get('msg', ''))
+        if len(names) == 1:
+            failures = result.get('failures') or []
+            return [], [], {names[0]: to_text(failures[0]) if failures else msg}
+
+        # dnf names unavailable specs explicitly; drop those and retry the rest once
+        named = {}
+        for failure in result.get('failures') or []:
+            failure = to_text(failure)
+            for name in names:
+                if name not in named and (failure.startswith(name + ' ') or 'No package %s ' % name in failure):
+                    named[name] = failure
+        if named:
+            remainder = [name for name in names if name not in named]
+            if not remainder:
+                return [], [], named
+            changed, unchanged, failures = self._install(remainder, state, dnf_args, task_vars)
+            failures.update(named)
+            return changed, unchanged, failures
+
+        # Depsolve and GPG errors do not identify the offending spec; bisect
+        middle = len(names) // 2
+        left = self._install(names[:middle], state, dnf_args, task_vars)
+        right = self._install(names[middle:], state, dnf_args, task_vars)
+        failures = dict(left[2])
+        failures.update(right[2])
+        return left[0] + right[0], left[1] + right[1], failures
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+
+        names = self._normalize_names(self._task.args.get('name', []))
+        state = self._task.args.get('state', 'present')
+        if state not in ('present', 'installed', 'latest'):
+            raise AnsibleActionFail("state must be one of: present, installed, latest")
+        dnf_args = dict((k, self._task.args[k]) for k in DNF_PASSTHROUGH_ARGS if k in self._task.args)
+
+        self._transactions = 0
+        present = set()
+        if state != 'latest' and names:
+            present = self._query_present(names, task_vars)
+
+        pending = [name for name in names if name not in present]
+        changed, failures = [], {}
+        if pending:
+            changed, dummy, failures = self._install(pending, state, dnf_args, task_vars)
+
+        results = []
+        for name in names:
+            if name in failures:
+                results.append({'item': name, 'changed': False, 'failed': True, 'msg': failures[name]})
+            elif name in changed:
+                results.append({'item': name, 'changed': True, 'failed': False, 'msg': 'Installed'})
+            else:
+                results.append({'item': name, 'changed': False, 'failed': False, 'msg': 'Already present'})
+
+        # 'failed' is set explicitly so per-package failures in 'results' do not fail the task
+        result.update(
+            changed=bool(changed),
+            failed=False,
+            results=results,
+            installed=[r['item'] for r in results if r['changed']],
+            already_present=[r['item'] for r in results if not r['changed'] and not r['failed']],
+            skipped_packages=sorted(failures),
+            failures=failures,
+            transactions=self._transactions,
+        )
+        return result
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Filters for the IP plan of libvirt networks and host bridges.
+
+libvirt_network_addressing() is the single place that derives the subnet and
+DHCP range of a NAT or isolated network; the network templates and
+ip_plan_conflicts() both use it, so the validator checks exactly what is
+rendered. ip_plan_conflicts() takes the plan of every host in a play at once
+and finds overlaps by sorting address intervals, so a play is validated in
+O(n log n) for n subnets, ranges and addresses.
+"""
+
+from __future__ import annotations
+
+import heapq
+import ipaddress
+
+from ansible.errors import AnsibleFilterError
+from ansible.module_utils.common.text.converters import to_text
+
+# Subnets the templates give networks without an address: 192.168.<base + index>.1/24
+DEFAULT_THIRD_OCTET = dict(nat=100, isolated=200)
+
+
+def _interface(value, what):
+    try:
+        return ipaddress.ip_interface(to_text(value))
+    except ValueError as e:
+        raise AnsibleFilterError('%s: %s' % (what, e))
+
+
+def _address(value, what):
+    try:
+        return ipaddress.ip_address(to_text(value))
+    except ValueError as e:
+        raise AnsibleFilterError('%s: %s' % (what, e))
+
+
+def libvirt_network_addressing(network, index=0, mode=None):
+    """Address, netmask and DHCP range of a NAT or isolated libvirt network.
+
+    index is the position of the network in kvmhost_libvirt_networks and mode
+    defaults to network['mode']. network['address'] (gateway address with prefix, for example 10.0.0.1/24) and
+    network['dhcp_range'] (start and end) override the defaults. Returns None for
+    modes that attach to an existing bridge and have no subnet of their own.
+    """
+    mode = mode or network.get('mode', 'bridge')
+    if mode not in DEFAULT_THIRD_OCTET:
+        return None
+    name = network.get('name', 'unnamed')
+    if network.get('address'):
+        gateway = _interface(network['address'], 'network %s address' % name)
+    else:
+        gateway = ipaddress.ip_interface(u'192.168.%d.1/24' % (DEFAULT_THIRD_OCTET[mode] + int(index)))
+    subnet = gateway.network
+    dhcp_range = network.get('dhcp_range') or {}
+    start = _address(dhcp_range['start'], 'network %s dhcp_range start' % name) if dhcp_range.get('start') \
+        else subnet.network_address + 2
+    end = _address(dhcp_range['end'], 'network %s dhcp_range end' % name) if dhcp_range.get('end') \
+        else subnet.broadcast_address - 1
+    return dict(
+        address=str(gateway.ip),
+        netmask=str(subnet.netmask),
+        prefix=subnet.prefixlen,
+        subnet=str(subnet),
+        dhcp_start=str(start),
+        dhcp_end=str(end),
+    )
+
+
+def _span(network):
+    # The version keeps IPv4 and IPv6 intervals apart when they are sorted together
+    return (network.version, int(network.network_address)), (network.version, int(network.broadcast_address))
+
+
+def _overlaps(intervals):
+    """Yield every pair of overlapping (start, end, label) intervals.
+
+    Sorted sweep with a heap of the open intervals' ends: O(n log n + k) for k pairs.
+    """
+    open_ends = []
+    for start, end, label in sorted(intervals, key=lambda interval: interval[:2]):
+        while open_ends and open_ends[0][0] < start:
+            heapq.heappop(open_ends)
+        for dummy, other in open_ends:
+            yield other, label
+        heapq.heappush(open_ends, (end, label))
+
+
+def _conflict(conflicts, severity, kind, hosts, message):
+    conflicts.append(dict(severity=severity, kind=kind, hosts=sorted(set(hosts)), message=message))
+
+
+def _check_network(conflicts, host, network, addressing):
+    name = network.get('name', 'unnamed')
+    subnet = ipaddress.ip_network(addressing['subnet'])
+    gateway = ipaddress.ip_address(addressing['address'])
+    start = ipaddress.ip_address(addressing['dhcp_start'])
+    end = ipaddress.ip_address(addressing['dhcp_end'])
+    where = '%s: network %s' % (host, name)
+
+    # ipaddress cannot order addresses of different families, so those are reported first
+    if start.version != subnet.version or end.version != subnet.version:
+        _conflict(conflicts, 'error', 'dhcp_range_family', [host],
+                  '%s DHCP range %s-%s is not IPv%d like %s' % (where, start, end, subnet.version, subnet))
+        start = end = None
+    elif start not in subnet or end not in subnet or start > end:
+        _conflict(conflicts, 'error', 'dhcp_range_invalid', [host],
+                  '%s DHCP range %s-%s is not an ascending range inside %s' % (where, start, end, subnet))
+    elif start <= gateway <= end:
+        _conflict(conflicts, 'error', 'dhcp_range_gateway', [host],
+                  '%s DHCP range %s-%s contains the gateway %s' % (where, start, end, gateway))
+
+    addresses, macs = {}, {}
+    for reservation in network.get('dhcp_hosts') or []:
+        label = reservation.get('name') or reservation.get('mac') or reservation.get('ip')
+        ip = _address(reservation.get('ip'), '%s reservation %s' % (where, label))
+        mac = to_text(reservation.get('mac') or '').lower()
+        if ip.version != subnet.version:
+            _conflict(conflicts, 'error', 'reservation_family', [host],
+                      '%s reservation %s (%s) is not IPv%d like %s' % (where, label, ip, subnet.version, subnet))
+        elif ip not in subnet:
+            _conflict(conflicts, 'error', 'reservation_outside_subnet', [host],
+                      '%s reservation %s (%s) is outside %s' % (where, label, ip, subnet))
+        elif ip == gateway:
+            _conflict(conflicts, 'error', 'reservation_gateway', [host],
+                      '%s reservation %s uses the gateway address %s' % (where, label, ip))
+        elif start is not None and start <= ip <= end:
+            _conflict(conflicts, 'error', 'reservation_in_dhcp_range', [host],
+                      '%s reservation %s (%s) is inside the DHCP range %s-%s' % (where, label, ip, start, end))
+        if ip in addresses:
+            _conflict(conflicts, 'error', 'reservation_duplicate_ip', [host],
+                      '%s reservations %s and %s share %s' % (where, addresses[ip], label, ip))
+        addresses.setdefault(ip, label)
+        if mac and mac in macs:
+            _conflict(conflicts, 'error', 'reservation_duplicate_mac', [host],
+                      '%s reservations %s and %s share MAC %s' % (where, macs[mac], label, mac))
+        if mac:
+            macs.setdefault(mac, label)
+
+
+def ip_plan_conflicts(plan):
+    """Find conflicts in the IP plan of a set of hosts.
+
+    plan is a list of dicts with host, addresses (the host's bridge and VLAN
+    addresses with prefix or netmask), l2_domain (hosts sharing a LAN; defaults to
+    the subnet of the first address) and networks (kvmhost_libvirt_networks).
+
+    Returns a list of dicts with severity (error or warning), kind, hosts and message:
+    overlapping subnets on a host, DHCP ranges and reservations that collide, host
+    addresses reused within an L2 domain, and host-local subnets reused by hosts of
+    the same L2 domain (a warning, since each stays behind its own host's NAT).
+    """
+    if not isinstance(plan, list):
+        raise AnsibleFilterError('ip_plan_conflicts expects a list of host plans')
+
+    conflicts = []
+    domain_addresses = {}
+    domain_subnets = {}
+    for entry in plan:
+        host = to_text(entry.get('host', 'unknown'))
+        intervals = []
+        seen_subnets = set()
+        domain = entry.get('l2_domain')
+        for value in entry.get('addresses') or []:
+            if not value:
+                continue
+            interface = _interface(value, '%s: address' % host)
+            domain = domain or str(interface.network)
+            domain_addresses.setdefault(domain, []).append((interface.ip, host))
+            # Several addresses in one subnet (a bridge and an alias) are one subnet
+            if interface.network not in seen_subnets:
+                seen_subnets.add(interface.network)
+                intervals.append(_span(interface.network) + ('host subnet %s' % interface.network,))
+
+        for index, network in enumerate(entry.get('networks') or []):
+            if not network.get('create', True) or network.get('state') == 'absent':
+                continue
+            addressing = libvirt_network_addressing(network, index)
+            if addressing is None:
+                continue
+            subnet = ipaddress.ip_network(addressing['subnet'])
+            label = 'network %s (%s)' % (network.get('name', 'unnamed'), subnet)
+            intervals.append(_span(subnet) + (label,))
+            if domain:
+                domain_subnets.setdefault(domain, {}).setdefault(subnet, set()).add(host)
+            _check_network(conflicts, host, network, addressing)
+
+        for first, second in _overlaps(intervals):
+            _conflict(conflicts, 'error', 'subnet_overlap', [host], '%s: %s overlaps %s' % (host, first, second))
+
+    for domain, addresses in domain_addresses.items():
+        addresses.sort(key=lambda item: (item[0].version, item[0], item[1]))
+        for (ip, host), (next_ip, next_host) in zip(addresses, addresses[1:]):
+            if ip == next_ip:
+                _conflict(conflicts, 'error', 'address_reused', [host, next_host],
+                          'L2 domain %s: %s is used by both %s and %s' % (domain, ip, host, next_host))
+
+    # Hosts are grouped by subnet first, so a default subnet on every host is one warning, not one per pair
+    for domain, subnets in domain_subnets.items():
+        for subnet, hosts in subnets.items():
+            if len(hosts) > 1:
+                _conflict(conflicts, 'warning', 'subnet_reused', hosts,
+                          'L2 domain %s: %s is used by %s' % (domain, subnet, ', '.join(sorted(hosts))))
+        for first, second in _overlaps([_span(subnet) + (subnet,) for subnet in subnets]):
+            hosts = subnets[first] | subnets[second]
+            if len(hosts) > 1:
+                _conflict(conflicts, 'warning', 'subnet_reused', hosts,
+                          'L2 domain %s: %s on %s overlaps %s on %s'
+                          % (domain, first, ', '.join(sorted(subnets[first])), second, ', '.join(sorted(subnets[second]))))
+
+    return sorted(conflicts, key=lambda conflict: (conflict['severity'] != 'error', conflict['kind'], conflict['message']))
+
+
+class FilterModule(object):
+
+    def filters(self):
+        return {
+            'libvirt_network_addressing': libvirt_network_addressing,
+            'ip_plan_conflicts': ip_plan_conflicts,
+        }
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""CPU list parsing and host CPU topology for the collection's tuning modules.
+
+CPU sets are handled as sorted lists of CPU numbers and written in the kernel's
+cpulist format (0-3,8-11), which isolcpus, libvirt cpuset attributes and
+irqbalance all accept. The topology is read from sysfs, so modules see the same
+CPUs and siblings the scheduler does.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+
+
+def parse_cpulist(text):
+    """Parse a kernel cpulist such as 0-3,8,10-11 into a sorted list of CPU numbers."""
+    cpus = set()
+    for part in (text or '').replace(' ', ',').split(','):
+        if part:
+            first, dummy, last = part.partition('-')
+            cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def format_cpulist(cpus):
+    """Format CPU numbers as a kernel cpulist with ranges, 0-3,8."""
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join('%d' % first if first == last else '%d-%d' % (first, last) for first, last in ranges)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def cpu_topology(sysfs='/sys'):
+    """Map each online CPU to dict(cpu, node, package, core, siblings).
+
+    core is the lowest CPU of its SMT sibling group, so it identifies the physical
+    core across packages. Hosts without NUMA support in sysfs have every CPU on node 0.
+    """
+    cpu_root = os.path.join(sysfs, 'devices/system/cpu')
+    online = parse_cpulist(_read(os.path.join(cpu_root, 'online')))
+    nodes = {}
+    for path in glob.glob(os.path.join(sysfs, 'devices/system/node/node[0-9]*')):
+        for cpu in parse_cpulist(_read(os.path.join(path, 'cpulist'))):
+            nodes[cpu] = int(os.path.basename(path)[4:])
+    topology = {}
+    for cpu in online:
+        base = os.path.join(cpu_root, 'cpu%d' % cpu, 'topology')
+        siblings = parse_cpulist(_read(os.path.join(base, 'thread_siblings_list'))) or [cpu]
+        siblings = [sibling for sibling in siblings if sibling in online]
+        topology[cpu] = dict(
+            cpu=cpu,
+            node=nodes.get(cpu, 0),
+            package=int(_read(os.path.join(base, 'physical_package_id')) or 0),
+            core=min(siblings),
+            siblings=siblings,
+        )
+    return topology
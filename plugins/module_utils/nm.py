@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Shared helpers for the collection's NetworkManager modules.
+
+The modules talk to NetworkManager over D-Bus in one session. Desired settings
+are kept as {section: {key: (plain, dbus)}}: the plain value is compared with
+the unwrapped settings NetworkManager returns, the dbus value is what is written.
+Changes are made inside a checkpoint that is rolled back when the result does
+not come up, or by NetworkManager itself when the module is cut off.
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+import time
+import traceback
+
+from ansible.module_utils.basic import missing_required_lib
+
+DBUS_IMPORT_ERROR = None
+try:
+    import dbus
+except ImportError:
+    dbus = None
+    DBUS_IMPORT_ERROR = traceback.format_exc()
+
+NM_BUS = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+SETTINGS_PATH = NM_PATH + '/Settings'
+SETTINGS_IFACE = NM_BUS + '.Settings'
+CONNECTION_IFACE = SETTINGS_IFACE + '.Connection'
+DEVICE_IFACE = NM_BUS + '.Device'
+ACTIVE_IFACE = NM_BUS + '.Connection.Active'
+IP4_CONFIG_IFACE = NM_BUS + '.IP4Config'
+PROPS_IFACE = 'org.freedesktop.DBus.Properties'
+
+DEVICE_STATE_ACTIVATED = 100
+CHECKPOINT_DELETE_NEW_CONNECTIONS = 0x2
+CHECKPOINT_DISCONNECT_NEW_DEVICES = 0x4
+ETHERNET_TYPE = '802-3-ethernet'
+
+# GetSettings omits properties that are at their default value
+SETTING_DEFAULTS = {
+    ('connection', 'autoconnect'): True,
+    ('bridge', 'stp'): True,
+    ('bridge', 'forward-delay'): 15,
+    ('bridge', 'hello-time'): 2,
+    ('bridge', 'max-age'): 20,
+    ('bridge', 'priority'): 32768,
+    ('ipv4', 'address-data'): [],
+    ('ipv4', 'gateway'): None,
+    ('ipv4', 'dns'): [],
+    (ETHERNET_TYPE, 'mtu'): 0,
+    ('ovs-bridge', 'stp-enable'): False,
+    ('ovs-port', 'tag'): 0,
+    ('ovs-interface', 'type'): '',
+}
+
+IP_ARGUMENT_SPEC = dict(
+    ipv4_method=dict(type='str', choices=['auto', 'manual', 'disabled', 'link-local']),
+    ipv4_addresses=dict(type='list', elements='str'),
+    ipv4_gateway=dict(type='str'),
+    ipv4_dns=dict(type='list', elements='str'),
+    ipv6_method=dict(type='str', choices=['auto', 'dhcp', 'manual', 'ignore', 'disabled', 'link-local']),
+)
+
+ETHTOOL_PREFIXES = ('feature-', 'ring-', 'coalesce-')
+
+CHECKPOINT_ARGUMENT_SPEC = dict(
+    activation_timeout=dict(type='int', default=30),
+    rollback_timeout=dict(type='int', default=90),
+)
+
+
+class ActivationError(Exception):
+    pass
+
+
+def check_requirements(module):
+    """Fail the module when python3-dbus is missing or the timeouts are inconsistent."""
+    if dbus is None:
+        module.fail_json(msg=missing_required_lib('python3-dbus'), exception=DBUS_IMPORT_ERROR)
+    if module.params['rollback_timeout'] <= module.params['activation_timeout']:
+        module.fail_json(msg='rollback_timeout must be larger than activation_timeout')
+
+
+def unwrap(value):
+    """Convert dbus values to plain Python values."""
+    if isinstance(value, dbus.Boolean):
+        return bool(value)
+    if isinstance(value, (dbus.Dictionary, dict)):
+        return dict((str(k), unwrap(v)) for k, v in value.items())
+    if isinstance(value, dbus.ByteArray):
+        return bytes(value)
+    if isinstance(value, (dbus.Array, list, tuple)):
+        return [unwrap(v) for v in value]
+    if isinstance(value, (dbus.String, dbus.ObjectPath)):
+        return str(value)
+    if isinstance(value, (int, dbus.Byte, dbus.Int16, dbus.UInt16, dbus.Int32, dbus.UInt32, dbus.Int64, dbus.UInt64)):
+        return int(value)
+    return value
+
+
+def ip_to_u32(address):
+    return struct.unpack('=I', socket.inet_aton(address))[0]
+
+
+def u32_to_ip(value):
+    return socket.inet_ntoa(struct.pack('=I', value))
+
+
+class NetworkManager(object):
+
+    def __init__(self):
+        self.bus = dbus.SystemBus()
+        self.nm = self.iface(NM_PATH, NM_BUS)
+        self.settings = self.iface(SETTINGS_PATH, SETTINGS_IFACE)
+
+    def iface(self, path, name):
+        return dbus.Interface(self.bus.get_object(NM_BUS, path), name)
+
+    def prop(self, path, iface, name):
+        return self.iface(path, PROPS_IFACE).Get(iface, name)
+
+    def connections(self):
+        """Map of connection path to (raw dbus settings, plain settings)."""
+        result = {}
+        for path in self.settings.ListConnections():
+            raw = self.iface(path, CONNECTION_IFACE).GetSettings()
+            result[str(path)] = (raw, unwrap(raw))
+        return result
+
+    def device(self, ifname):
+        try:
+            return str(self.nm.GetDeviceByIpIface(ifname))
+        except dbus.exceptions.DBusException:
+            return None
+
+    def device_info(self, path):
+        info = dict(state=int(self.prop(path, DEVICE_IFACE, 'State')), active_uuid=None, addresses=[])
+        active = str(self.prop(path, DEVICE_IFACE, 'ActiveConnection'))
+        if active != '/':
+            info['active_uuid'] = str(self.prop(active, ACTIVE_IFACE, 'Uuid'))
+        ip4 = str(self.prop(path, DEVICE_IFACE, 'Ip4Config'))
+        if ip4 != '/':
+            info['addresses'] = ['%s/%d' % (a['address'], a['prefix'])
+                                 for a in unwrap(self.prop(ip4, IP4_CONFIG_IFACE, 'AddressData'))]
+        return info
+
+    def add(self, sections):
+        return str(self.settings.AddConnection(new_connection(sections)))
+
+    def update(self, path, raw, desired):
+        self.iface(path, CONNECTION_IFACE).Update(merge(raw, desired))
+
+    def activate(self, connection, device='/'):
+        self.nm.ActivateConnection(dbus.ObjectPath(connection), dbus.ObjectPath(device), dbus.ObjectPath('/'))
+
+    def checkpoint(self, rollback_timeout):
+        flags = CHECKPOINT_DELETE_NEW_CONNECTIONS | CHECKPOINT_DISCONNECT_NEW_DEVICES
+        return self.nm.CheckpointCreate(dbus.Array([], signature='o'), dbus.UInt32(rollback_timeout),
+                                        dbus.UInt32(flags))
+
+    def rollback(self, checkpoint):
+        try:
+            self.nm.CheckpointRollback(checkpoint)
+        except dbus.exceptions.DBusException:
+            pass
+
+
+def describe(path, settings):
+    if path is None:
+        return None
+    conn = settings.get('connection', {})
+    ipv4 = settings.get('ipv4', {})
+    return dict(
+        path=path,
+        id=conn.get('id'),
+        uuid=conn.get('uuid'),
+        type=conn.get('type'),
+        interface=conn.get('interface-name'),
+        master=conn.get('master'),
+        autoconnect=conn.get('autoconnect', True),
+        ipv4=dict(
+            method=ipv4.get('method'),
+            addresses=['%s/%d' % (a['address'], a['prefix']) for a in ipv4.get('address-data', [])],
+            gateway=ipv4.get('gateway'),
+            dns=[u32_to_ip(d) for d in ipv4.get('dns', [])],
+        ),
+        ipv6_method=settings.get('ipv6', {}).get('method'),
+        mtu=settings.get(ETHERNET_TYPE, {}).get('mtu', 0),
+        ethtool=settings.get('ethtool', {}),
+    )
+
+
+def primary_connection(nm, connections, ifname, exclude=()):
+    """Path of the connection active on ifname, unless it is one of exclude."""
+    device = nm.device(ifname)
+    if device is None:
+        return None
+    active_uuid = nm.device_info(device)['active_uuid']
+    for path, (raw, plain) in connections.items():
+        if path not in exclude and plain['connection'].get('uuid') == active_uuid:
+            return path
+    return None
+
+
+def ip_settings(params, copy_from):
+    """Desired ipv4/ipv6 sections from the ipv4_*/ipv6_method params.
+
+    When ipv4_method or ipv6_method is not set, the setting is taken from copy_from,
+    a describe() result, or left out when copy_from is None.
+    """
+    desired = {}
+    ipv4_method, ipv6_method = params['ipv4_method'], params['ipv6_method']
+    addresses, gateway, dns = params['ipv4_addresses'], params['ipv4_gateway'], params['ipv4_dns']
+    if ipv4_method is None and copy_from is not None and copy_from['ipv4']['method']:
+        ipv4_method = copy_from['ipv4']['method']
+        addresses, gateway, dns = copy_from['ipv4']['addresses'], copy_from['ipv4']['gateway'], copy_from['ipv4']['dns']
+    if ipv6_method is None and copy_from is not None:
+        ipv6_method = copy_from['ipv6_method']
+
+    if ipv4_method is not None:
+        address_data = []
+        for cidr in addresses or []:
+            address, dummy, prefix = cidr.partition('/')
+            address_data.append({'address': address, 'prefix': int(prefix or 24)})
+        desired['ipv4'] = {
+            'method': (ipv4_method, dbus.String(ipv4_method)),
+            'address-data': (address_data, dbus.Array(
+                [dbus.Dictionary({'address': dbus.String(a['address']), 'prefix': dbus.UInt32(a['prefix'])},
+                                 signature='sv') for a in address_data], signature='a{sv}')),
+            'gateway': (gateway or None, dbus.String(gateway) if gateway else None),
+            'dns': ([ip_to_u32(d) for d in dns or []], dbus.Array([dbus.UInt32(ip_to_u32(d)) for d in dns or []],
+                                                                   signature='u')),
+        }
+    if ipv6_method is not None:
+        desired['ipv6'] = {'method': (ipv6_method, dbus.String(ipv6_method))}
+    return desired
+
+
+def ethtool_settings(module, ethtool):
+    """Desired ethtool section from a dict of NetworkManager ethtool property names."""
+    unknown = [key for key in ethtool if not key.startswith(ETHTOOL_PREFIXES)]
+    if unknown:
+        module.fail_json(msg='Unsupported ethtool keys: %s' % ', '.join(sorted(unknown)))
+    settings = {}
+    for key, value in ethtool.items():
+        if key.startswith('feature-'):
+            settings[key] = (bool(value), dbus.Boolean(value))
+        else:
+            settings[key] = (int(value), dbus.UInt32(value))
+    return settings
+
+
+def differs(desired, plain):
+    for section, values in desired.items():
+        current = plain.get(section, {})
+        for key, (value, dummy) in values.items():
+            if current.get(key, SETTING_DEFAULTS.get((section, key))) != value:
+                return True
+    return False
+
+
+def merge(raw, desired):
+    """Apply desired values to raw dbus settings in place."""
+    for section, values in desired.items():
+        target = raw.setdefault(section, dbus.Dictionary({}, signature='sv'))
+        for key, (dummy, value) in values.items():
+            if value is None:
+                target.pop(key, None)
+            else:
+                target[key] = value
+        if section == 'ipv4':
+            # The deprecated forms take precedence over address-data, gateway and dns when present
+            for key in ('addresses', 'routes', 'dns-data'):
+                target.pop(key, None)
+    return raw
+
+
+def sections(connection, desired):
+    """Settings for a new connection: the connection section plus the dbus values of desired."""
+    result = {'connection': connection}
+    for section, values in desired.items():
+        result.setdefault(section, {}).update((k, v) for k, (dummy, v) in values.items() if v is not None)
+    return result
+
+
+def new_connection(sections):
+    settings = dbus.Dictionary({}, signature='sa{sv}')
+    for section, values in sections.items():
+        settings[section] = dbus.Dictionary(values, signature='sv')
+    return settings
+
+
+def wait_active(nm, ifname, need_address, timeout):
+    deadline = time.time() + timeout
+    while True:
+        device = nm.device(ifname)
+        if device is not None:
+            info = nm.device_info(device)
+            if info['state'] == DEVICE_STATE_ACTIVATED and (info['addresses'] or not need_address):
+                return
+        if time.time() >= deadline:
+            raise ActivationError('%s did not become active with an address within %ds' % (ifname, timeout))
+        time.sleep(0.5)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Shared helpers for the collection's libvirt modules.
+
+All modules open one connection per task and compare definitions with
+xml_subset(), so defaults that libvirt fills in (uuid, mac, generated
+addresses) never count as drift. Networks and storage pools share the same
+persistent-object lifecycle, handled by the functions at the end of this file;
+each appends what it did to report['actions'].
+"""
+
+from __future__ import annotations
+
+import traceback
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils.basic import missing_required_lib
+
+LIBVIRT_IMPORT_ERROR = None
+try:
+    import libvirt
+except ImportError:
+    libvirt = None
+    LIBVIRT_IMPORT_ERROR = traceback.format_exc()
+
+LIBVIRT_ARGUMENT_SPEC = dict(
+    uri=dict(type='str', default='qemu:///system'),
+)
+
+
+def _silence(ctx, err):
+    # libvirt prints every error to stderr by default; errors are raised as exceptions anyway
+    pass
+
+
+def open_connection(uri):
+    """Open a libvirt connection, raising libvirt.libvirtError on failure."""
+    libvirt.registerErrorHandler(_silence, None)
+    return libvirt.open(uri)
+
+
+def connect(module):
+    """Open the libvirt connection for module.params['uri'] or fail the module."""
+    if libvirt is None:
+        module.fail_json(msg=missing_required_lib('libvirt-python'), exception=LIBVIRT_IMPORT_ERROR)
+    try:
+        return open_connection(module.params['uri'])
+    except libvirt.libvirtError as e:
+        module.fail_json(msg='Failed to connect to %s: %s' % (module.params['uri'], e))
+
+
+def lookup(lookup_fn, name, missing_code):
+    """Return the object named name, or None when libvirt reports missing_code."""
+    try:
+        return lookup_fn(name)
+    except libvirt.libvirtError as e:
+        if e.get_error_code() == missing_code:
+            return None
+        raise
+
+
+def parse_xml(module, text, what):
+    try:
+        return ET.fromstring(text)
+    except ET.ParseError as e:
+        module.fail_json(msg='Invalid XML for %s: %s' % (what, e))
+
+
+def xml_subset(want, have):
+    """Whether every element, attribute and text of want is present in have.
+
+    Children are matched by tag in any order; each element of have is used once.
+    """
+    if want.tag != have.tag:
+        return False
+    for key, value in want.attrib.items():
+        if have.attrib.get(key) != value:
+            return False
+    want_text = (want.text or '').strip()
+    if want_text and want_text != (have.text or '').strip():
+        return False
+
+    used = set()
+    for want_child in want:
+        for index, have_child in enumerate(have):
+            if index not in used and xml_subset(want_child, have_child):
+                used.add(index)
+                break
+        else:
+            return False
+    return True
+
+
+def ensure_uuid(want, have):
+    """Copy the uuid of the live definition into want so a redefine updates in place."""
+    if want.find('uuid') is None and have.find('uuid') is not None:
+        uuid = ET.SubElement(want, 'uuid')
+        uuid.text = have.find('uuid').text
+    return want
+
+
+def to_xml(element):
+    return ET.tostring(element, encoding='unicode')
+
+
+def define(module, report, obj, spec, want, define_fn, inactive_flag, diffs):
+    """Define obj from spec['xml'] when it is missing or its persistent definition drifted.
+
+    Returns the (possibly new) object. Drift on a running object is restarted when
+    module.params['restart_on_change'] is set, otherwise flagged as pending_restart.
+    """
+    name = spec['name']
+    before = ''
+    if obj is None:
+        report['actions'].append('defined')
+        if not module.check_mode:
+            obj = define_fn(spec['xml'])
+    else:
+        before = obj.XMLDesc(inactive_flag if obj.isPersistent() else 0)
+        have = parse_xml(module, before, 'live definition of %s' % name)
+        if not obj.isPersistent() or not xml_subset(want, have):
+            report['actions'].append('redefined')
+            if not module.check_mode:
+                obj = define_fn(to_xml(ensure_uuid(want, have)))
+            if obj.isActive():
+                if module.params['restart_on_change']:
+                    report['actions'].append('restarted')
+                    if not module.check_mode:
+                        obj.destroy()
+                        obj.create()
+                else:
+                    report['pending_restart'] = True
+    if report['actions']:
+        diffs.append(dict(before_header=name, before=before, after_header=name, after=spec['xml']))
+    return obj
+
+
+def set_active(module, report, obj, active):
+    """Start or stop obj; returns whether it is active afterwards."""
+    is_active = obj is not None and bool(obj.isActive())
+    if active and not is_active:
+        report['actions'].append('started')
+        if not module.check_mode:
+            obj.create()
+    elif not active and is_active:
+        report['actions'].append('stopped')
+        if not module.check_mode:
+            obj.destroy()
+    return active
+
+
+def set_autostart(module, report, obj, autostart):
+    """Enable or disable autostart of obj; returns the resulting setting."""
+    if (obj is not None and bool(obj.autostart())) != autostart:
+        report['actions'].append('autostart_enabled' if autostart else 'autostart_disabled')
+        if not module.check_mode:
+            obj.setAutostart(1 if autostart else 0)
+    return autostart
+
+
+def remove(module, report, obj, diffs):
+    """Stop and undefine obj. Data held by the object (pool volumes) is left in place."""
+    if obj is None:
+        return
+    before = obj.XMLDesc(0)
+    set_active(module, report, obj, False)
+    if obj.isPersistent():
+        report['actions'].append('undefined')
+        if not module.check_mode:
+            obj.undefine()
+    diffs.append(dict(before_header=report['name'], before=before, after_header=report['name'], after=''))
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: cpu_partition
+short_description: Split host CPUs into housekeeping and guest CPUs along the CPU topology
+description:
+  - Reads the CPU topology from sysfs and reserves the first O(housekeeping_cores) physical cores
+    of every NUMA node, with all their SMT siblings, for the host. libvirtd, QEMU I/O and emulator
+    threads and interrupts run there; the remaining CPUs are left to guest vCPUs.
+  - Keeping housekeeping on every node lets each node's guests use local host threads, and keeping
+    siblings together stops a guest vCPU from sharing a core with host work.
+  - Returns matching C(isolcpus), C(nohz_full), C(rcu_nocbs) and C(irqaffinity) kernel arguments,
+    the systemd C(CPUAffinity) value and the irqbalance banned CPU list, and sets the
+    C(kvmhost_cpu_partition) fact that pinning tasks use.
+  - The module only plans; it changes nothing on the host.
+version_added: "0.11.0"
+options:
+  housekeeping_cores:
+    description:
+      - Physical cores reserved for the host on each NUMA node.
+    type: int
+    default: 1
+  housekeeping:
+    description:
+      - Housekeeping CPUs as a cpulist, instead of O(housekeeping_cores). SMT siblings of the
+        listed CPUs are added.
+    type: str
+  isolcpus_flags:
+    description:
+      - Flags placed before the CPU list in C(isolcpus). C(managed_irq) keeps managed device
+        interrupts off the guest CPUs where possible.
+    type: list
+    elements: str
+    default: [managed_irq, domain]
+  sysfs:
+    description:
+      - Mount point of sysfs.
+    type: path
+    default: /sys
+notes:
+  - Supports check mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Reserve two cores per NUMA node for the host
+  tosin2013.qubinode_kvmhost_setup_collection.cpu_partition:
+    housekeeping_cores: 2
+  register: cpu_partition
+
+- name: Request the isolation kernel arguments
+  tosin2013.qubinode_kvmhost_setup_collection.kernel_args:
+    args: "{{ kvmhost_kernel_args | default([]) + cpu_partition.kernel_args }}"
+    apply: false
+  notify: apply kernel arguments
+'''
+
+RETURN = r'''
+housekeeping:
+  description: Housekeeping CPUs as a cpulist.
+  returned: always
+  type: str
+  sample: 0,1,24,25
+guest:
+  description: Guest CPUs as a cpulist. Empty when the host has no CPUs left for guests.
+  returned: always
+  type: str
+  sample: 2-23,26-47
+nodes:
+  description: Partition of each NUMA node.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    node:
+      description: Node number.
+      type: int
+    cpus:
+      description: Online CPUs of the node.
+      type: str
+    housekeeping:
+      description: Housekeeping CPUs of the node.
+      type: str
+    guest:
+      description: Guest CPUs of the node.
+      type: str
+kernel_args:
+  description: Isolation kernel arguments for the guest CPUs. Empty when there are no guest CPUs.
+  returned: always
+  type: list
+  elements: str
+cpu_affinity:
+  description: Housekeeping CPUs in the format of the systemd C(CPUAffinity) setting.
+  returned: always
+  type: str
+  sample: 0-1 24-25
+irqbalance_banned_cpulist:
+  description: CPUs irqbalance must not route interrupts to.
+  returned: always
+  type: str
+ansible_facts:
+  description: The partition, for pinning tasks.
+  returned: always
+  type: dict
+  contains:
+    kvmhost_cpu_partition:
+      description: RV(housekeeping), RV(guest) and RV(nodes).
+      type: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.cpulist import (
+    cpu_topology,
+    format_cpulist,
+    parse_cpulist,
+)
+
+
+def with_siblings(topology, cpus):
+    return set(sibling for cpu in cpus for sibling in topology[cpu]['siblings'])
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            housekeeping_cores=dict(type='int', default=1),
+            housekeeping=dict(type='str'),
+            isolcpus_flags=dict(type='list', elements='str', default=['managed_irq', 'domain']),
+            sysfs=dict(type='path', default='/sys'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    topology = cpu_topology(params['sysfs'])
+    if not topology:
+        module.fail_json(msg='No online CPUs found under %s' % params['sysfs'])
+
+    by_node = {}
+    for info in topology.values():
+        by_node.setdefault(info['node'], []).append(info)
+
+    if params['housekeeping']:
+        try:
+            requested = parse_cpulist(params['housekeeping'])
+        except ValueError:
+            module.fail_json(msg='housekeeping is not a cpulist: %s' % params['housekeeping'])
+        offline = [cpu for cpu in requested if cpu not in topology]
+        if offline:
+            module.fail_json(msg='Housekeeping CPUs are not online: %s' % format_cpulist(offline))
+        housekeeping = with_siblings(topology, requested)
+    else:
+        if params['housekeeping_cores'] < 1:
+            module.fail_json(msg='housekeeping_cores must be at least 1')
+        housekeeping = set()
+        for infos in by_node.values():
+            cores = sorted(set(info['core'] for info in infos))[:params['housekeeping_cores']]
+            housekeeping |= with_siblings(topology, cores)
+    if not housekeeping:
+        module.fail_json(msg='The partition leaves no CPU for the host')
+    guest = set(topology) - housekeeping
+
+    result = dict(
+        changed=False,
+        housekeeping=format_cpulist(housekeeping),
+        guest=format_cpulist(guest),
+        nodes=[],
+        kernel_args=[],
+        cpu_affinity=format_cpulist(housekeeping).replace(',', ' '),
+        irqbalance_banned_cpulist=format_cpulist(guest),
+    )
+    for node in sorted(by_node):
+        cpus = set(info['cpu'] for info in by_node[node])
+        result['nodes'].append(dict(
+            node=node,
+            cpus=format_cpulist(cpus),
+            housekeeping=format_cpulist(cpus & housekeeping),
+            guest=format_cpulist(cpus & guest),
+        ))
+    if guest:
+        result['kernel_args'] = [
+            'isolcpus=%s' % ','.join(params['isolcpus_flags'] + [result['guest']]),
+            'nohz_full=%s' % result['guest'],
+            'rcu_nocbs=%s' % result['guest'],
+            'irqaffinity=%s' % result['housekeeping'],
+        ]
+    else:
+        module.warn('All CPUs are housekeeping CPUs; no CPUs are isolated for guests')
+    result['ansible_facts'] = dict(kvmhost_cpu_partition=dict(
+        housekeeping=result['housekeeping'], guest=result['guest'], nodes=result['nodes']))
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
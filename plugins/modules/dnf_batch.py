@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: dnf_batch
+short_description: Install a package list in a single dnf transaction with per-package fallback
+description:
+  - Installs every missing package of O(name) in one dnf transaction, so the package list is
+    depsolved and the repository metadata loaded once instead of once per package.
+  - Packages already provided by the rpm database are detected with a single C(rpm) query and
+    never handed to dnf, so a converged host performs no dnf transaction at all.
+  - If the transaction fails, specs that dnf reports as unavailable are dropped and the remainder
+    is retried. Failures that do not name a spec (depsolve or GPG errors) are isolated by
+    bisecting the list, so only the offending packages are skipped.
+  - Returns a per-package C(results) list shaped like the result of a looped
+    M(ansible.builtin.dnf) task so existing INSTALLED/SKIPPED/ALREADY PRESENT reports keep working.
+  - This is an action plugin; all transactions run through M(ansible.builtin.dnf) on the target.
+version_added: "0.11.0"
+options:
+  name:
+    description:
+      - Package specs to install. Duplicates are ignored.
+    type: list
+    elements: str
+    required: true
+  state:
+    description:
+      - C(present) installs missing packages, C(latest) also updates installed ones.
+    type: str
+    choices: [present, installed, latest]
+    default: present
+  disable_gpg_check:
+    description: Passed to M(ansible.builtin.dnf).
+    type: bool
+  skip_broken:
+    description: Passed to M(ansible.builtin.dnf).
+    type: bool
+  enablerepo:
+    description: Passed to M(ansible.builtin.dnf).
+    type: list
+    elements: str
+  disablerepo:
+    description: Passed to M(ansible.builtin.dnf).
+    type: list
+    elements: str
+  cacheonly:
+    description: Passed to M(ansible.builtin.dnf).
+    type: bool
+notes:
+  - Supports check mode. In check mode the rpm pre-check is skipped and per-package status is
+    derived from the dry-run transactions.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Install KVM host packages in one transaction
+  tosin2013.qubinode_kvmhost_setup_collection.dnf_batch:
+    name: "{{ required_rpm_packages }}"
+    state: present
+  register: package_install_result
+
+- name: Show packages that could not be installed
+  ansible.builtin.debug:
+    var: package_install_result.failures
+'''
+
+RETURN = r'''
+results:
+  description: One entry per requested package, in request order.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    item:
+      description: Package spec.
+      type: str
+    changed:
+      description: Whether the package was installed by this task.
+      type: bool
+    failed:
+      description: Whether the package was skipped because dnf could not install it.
+      type: bool
+    msg:
+      description: dnf error for skipped packages, otherwise a short status.
+      type: str
+installed:
+  description: Specs installed by this task.
+  returned: always
+  type: list
+  elements: str
+already_present:
+  description: Specs that were already provided by installed packages.
+  returned: always
+  type: list
+  elements: str
+skipped_packages:
+  description: Specs that could not be installed.
+  returned: always
+  type: list
+  elements: str
+failures:
+  description: Mapping of skipped spec to the dnf error reported for it.
+  returned: always
+  type: dict
+transactions:
+  description: Number of dnf transactions that were needed, C(0) on a converged host.
+  returned: always
+  type: int
+'''
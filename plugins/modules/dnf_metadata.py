@@ -0,0 +1,346 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: dnf_metadata
+short_description: Refresh dnf repository metadata only when it is stale or the repo configuration changed
+description:
+  - Reads the enabled repositories from the repository configuration files and the age of each
+    repository's cached metadata, without loading the metadata itself.
+  - Refreshes the metadata with a single C(dnf makecache) only for repositories whose cache is older
+    than O(max_age), or for all repositories when the repository configuration changed since the last
+    recorded refresh.
+  - Collects the enabled repository list, EPEL availability and the imported RPM GPG keys in the same
+    call, replacing separate C(dnf repolist) and C(rpm -qa gpg-pubkey*) invocations.
+  - The configuration digest and refresh time are recorded in O(state_path), together with the
+    ids of the imported GPG keys. These are the C(version-release) of each C(gpg-pubkey) package,
+    that is the short key id and the key creation time, not full fingerprints. They are only
+    re-read from the rpm database when the modification time of its files changed since they were
+    recorded.
+version_added: "0.11.0"
+options:
+  refresh:
+    description:
+      - C(auto) refreshes stale repositories and refreshes everything after a configuration change.
+      - C(always) forces a full refresh, C(never) only reports.
+    type: str
+    choices: [auto, always, never]
+    default: auto
+  max_age:
+    description:
+      - Maximum age in seconds of a repository's cached metadata before it is refreshed.
+    type: int
+    default: 21600
+  state_path:
+    description:
+      - File recording the configuration digest and time of the last refresh.
+    type: path
+    default: /var/lib/qubinode/dnf_metadata.json
+  repos_dir:
+    description:
+      - Directory holding the C(.repo) files.
+    type: path
+    default: /etc/yum.repos.d
+  cache_dirs:
+    description:
+      - Metadata cache roots to inspect. dnf4 uses C(/var/cache/dnf), dnf5 uses C(/var/cache/libdnf5).
+    type: list
+    elements: path
+    default: [/var/cache/dnf, /var/cache/libdnf5]
+notes:
+  - Supports check mode; no refresh is performed and RV(refreshed) reports what would happen.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Refresh package metadata only when stale
+  tosin2013.qubinode_kvmhost_setup_collection.dnf_metadata:
+    max_age: 21600
+  register: dnf_metadata
+
+- name: Report EPEL availability
+  ansible.builtin.debug:
+    msg: "EPEL enabled: {{ dnf_metadata.epel_enabled }}"
+'''
+
+RETURN = r'''
+repos:
+  description: Enabled repositories with the age of their cached metadata.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    id:
+      description: Repository id.
+      type: str
+    name:
+      description: Repository name.
+      type: str
+    file:
+      description: Configuration file defining the repository.
+      type: str
+    gpgcheck:
+      description: Whether package signatures are checked for this repository.
+      type: bool
+    age:
+      description: Age of the cached metadata in seconds, C(null) when nothing is cached.
+      type: int
+    stale:
+      description: Whether the metadata is missing or older than O(max_age).
+      type: bool
+enabled_repos:
+  description: Ids of the enabled repositories.
+  returned: always
+  type: list
+  elements: str
+epel_enabled:
+  description: Whether an enabled repository id starts with C(epel).
+  returned: always
+  type: bool
+stale_repos:
+  description: Ids of the repositories that were (or would be) refreshed.
+  returned: always
+  type: list
+  elements: str
+config_changed:
+  description: Whether the repository configuration changed since the last recorded refresh.
+  returned: always
+  type: bool
+refreshed:
+  description: Whether C(dnf makecache) was run (or would run in check mode).
+  returned: always
+  type: bool
+gpg_keys:
+  description: Imported RPM GPG public keys.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    id:
+      description:
+        - Key id as C(version-release) of the C(gpg-pubkey) package, the short key id and the key creation time.
+        - This is not the key fingerprint.
+      type: str
+    summary:
+      description: Key summary (owner).
+      type: str
+gpg_key_ids_cached:
+  description:
+    - Whether RV(gpg_keys) was taken from O(state_path) because the modification time of the rpm
+      database did not change since the key ids were recorded.
+  returned: always
+  type: bool
+gpg_key_ids_changed:
+  description: Whether the ids of the imported keys differ from the ones recorded by the previous run.
+  returned: always
+  type: bool
+config_digest:
+  description: sha256 digest of the repository configuration.
+  returned: always
+  type: str
+'''
+
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six.moves import configparser
+
+DNF_CONFIG_FILES = ('/etc/dnf/dnf.conf',)
+DNF_VARS_GLOB = '/etc/dnf/vars/*'
+# /var/lib/rpm links to /usr/lib/sysimage/rpm on EL10; sqlite writes land in the WAL first
+RPMDB_DIR = '/var/lib/rpm'
+RPMDB_FILES = ('rpmdb.sqlite', 'rpmdb.sqlite-wal', 'Packages', 'Packages.db')
+
+
+def config_files(repos_dir):
+    files = sorted(glob.glob(os.path.join(repos_dir, '*.repo')))
+    files.extend(sorted(glob.glob(DNF_VARS_GLOB)))
+    files.extend(path for path in DNF_CONFIG_FILES if os.path.exists(path))
+    return files
+
+
+def config_digest(files):
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def parse_bool(value, default):
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'yes', 'true', 'on')
+
+
+def enabled_repos(repos_dir):
+    repos = []
+    for path in sorted(glob.glob(os.path.join(repos_dir, '*.repo'))):
+        parser = configparser.RawConfigParser()
+        try:
+            parser.read(path)
+        except configparser.Error:
+            continue
+        for section in parser.sections():
+            options = dict(parser.items(section))
+            if not parse_bool(options.get('enabled'), True):
+                continue
+            repos.append({
+                'id': section,
+                'name': options.get('name', section),
+                'file': path,
+                'gpgcheck': parse_bool(options.get('gpgcheck'), False),
+            })
+    return repos
+
+
+def metadata_age(repo_id, cache_dirs, now):
+    """Age of the newest repodata file cached for repo_id, None when not cached."""
+    # The cache dir is <repo_id>-<16 hex digits>; a plain glob would also match epel-next-<hash> for epel
+    own_dir = re.compile(re.escape(repo_id) + r'-[0-9a-f]{16}$')
+    newest = None
+    for cache_dir in cache_dirs:
+        for path in glob.glob(os.path.join(cache_dir, glob.escape(repo_id) + '-*', 'repodata', '*')):
+            if not own_dir.match(os.path.basename(os.path.dirname(os.path.dirname(path)))):
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            newest = mtime if newest is None else max(newest, mtime)
+    return None if newest is None else max(0, int(now - newest))
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, 0o755)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.rename(tmp, path)
+
+
+def rpmdb_mtime():
+    mtimes = []
+    for name in RPMDB_FILES:
+        try:
+            mtimes.append(os.stat(os.path.join(RPMDB_DIR, name)).st_mtime)
+        except OSError:
+            continue
+    return max(mtimes) if mtimes else None
+
+
+def gpg_keys(module):
+    keys = []
+    rpm = module.get_bin_path('rpm')
+    if rpm is None:
+        return keys
+    rc, out, err = module.run_command(
+        [rpm, '-q', 'gpg-pubkey', '--qf', '%{VERSION}-%{RELEASE}\\t%{SUMMARY}\\n'])
+    if rc != 0:
+        return keys
+    for line in out.splitlines():
+        key_id, sep, summary = line.partition('\t')
+        if sep:
+            keys.append({'id': key_id, 'summary': summary})
+    return keys
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            refresh=dict(type='str', default='auto', choices=['auto', 'always', 'never']),
+            max_age=dict(type='int', default=21600),
+            state_path=dict(type='path', default='/var/lib/qubinode/dnf_metadata.json'),
+            repos_dir=dict(type='path', default='/etc/yum.repos.d'),
+            cache_dirs=dict(type='list', elements='path', default=['/var/cache/dnf', '/var/cache/libdnf5']),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    now = time.time()
+    digest = config_digest(config_files(params['repos_dir']))
+    state = load_state(params['state_path'])
+    changed_config = state.get('config_digest') != digest
+
+    repos = enabled_repos(params['repos_dir'])
+    for repo in repos:
+        repo['age'] = metadata_age(repo['id'], params['cache_dirs'], now)
+        repo['stale'] = repo['age'] is None or repo['age'] > params['max_age']
+
+    if params['refresh'] == 'always' or (params['refresh'] == 'auto' and changed_config):
+        to_refresh = [repo['id'] for repo in repos]
+    elif params['refresh'] == 'auto':
+        to_refresh = [repo['id'] for repo in repos if repo['stale']]
+    else:
+        to_refresh = []
+
+    # Imported keys only change with an rpmdb transaction, which updates the database files'
+    # mtime; until then the recorded key ids are reused
+    db_mtime = rpmdb_mtime()
+    recorded = state.get('gpg_key_ids')
+    ids_cached = db_mtime is not None and state.get('gpg_key_ids_rpmdb_mtime') == db_mtime and recorded is not None
+    keys = recorded if ids_cached else gpg_keys(module)
+    ids_changed = recorded is not None and sorted(k['id'] for k in keys) != sorted(k['id'] for k in recorded)
+    state_changed = not ids_cached
+
+    refreshed = bool(to_refresh)
+    if refreshed and not module.check_mode:
+        dnf = module.get_bin_path('dnf', required=True)
+        cmd = [dnf, '-q', 'makecache', '--refresh']
+        if len(to_refresh) < len(repos):
+            cmd.extend('--repo=%s' % repo_id for repo_id in to_refresh)
+        rc, out, err = module.run_command(cmd)
+        if rc != 0:
+            module.fail_json(msg='dnf makecache failed', rc=rc, stdout=out, stderr=err, stale_repos=to_refresh)
+
+        now = time.time()
+        for repo in repos:
+            repo['age'] = metadata_age(repo['id'], params['cache_dirs'], now)
+            repo['stale'] = repo['age'] is None or repo['age'] > params['max_age']
+        state.update(config_digest=digest, refreshed_at=int(now))
+        state_changed = True
+
+    if state_changed and not module.check_mode:
+        state.update(gpg_key_ids=keys, gpg_key_ids_rpmdb_mtime=db_mtime)
+        save_state(params['state_path'], state)
+
+    module.exit_json(
+        changed=refreshed,
+        refreshed=refreshed,
+        repos=repos,
+        enabled_repos=[repo['id'] for repo in repos],
+        epel_enabled=any(repo['id'].lower().startswith('epel') for repo in repos),
+        stale_repos=to_refresh,
+        config_changed=changed_config,
+        gpg_keys=keys,
+        gpg_key_ids_cached=ids_cached,
+        gpg_key_ids_changed=ids_changed,
+        config_digest=digest,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: hugepages
+short_description: Plan and allocate hugepages per NUMA node at runtime
+description:
+  - Reserves a share of the memory of every NUMA node as hugepages, read from
+    C(/sys/devices/system/node), so guests pinned to a node get local memory.
+  - Uses 1 GiB pages when the CPU supports them (C(pdpe1gb)) and every node can hold at least
+    one, otherwise 2 MiB pages.
+  - Pages are allocated at runtime through the per-node C(nr_hugepages) files, after compacting
+    the node. When fragmentation leaves a node short, RV(boot_args) holds the kernel arguments
+    that reserve the pages at boot instead, before memory is fragmented.
+  - Hosts without NUMA support in sysfs are treated as a single node using the global pool.
+version_added: "0.11.0"
+options:
+  percent:
+    description:
+      - Share of each node's memory to reserve, in percent.
+    type: float
+    default: 25
+  size:
+    description:
+      - Page size. C(auto) chooses C(1G) when the CPU and every node allow it.
+    type: str
+    choices: [auto, 2M, 1G]
+    default: auto
+  nodes:
+    description:
+      - Number of pages per node, keyed by node number, instead of O(percent).
+      - Nodes that are not listed get no pages.
+    type: dict
+  exclusive:
+    description:
+      - Release pages of the other page size on every node, so memory is not reserved twice
+        after the page size changes.
+    type: bool
+    default: true
+  apply:
+    description:
+      - Whether to change the runtime allocation. When false, only the plan is reported.
+    type: bool
+    default: true
+  sysfs:
+    description:
+      - Mount point of sysfs.
+    type: path
+    default: /sys
+notes:
+  - Supports check mode.
+  - Pages in use by running guests are not freed when a pool shrinks; the kernel releases them
+    as the guests stop.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Reserve a quarter of every node as hugepages
+  tosin2013.qubinode_kvmhost_setup_collection.hugepages:
+    percent: 25
+  register: hugepages_result
+
+- name: Reserve 1G pages on node 1 only
+  tosin2013.qubinode_kvmhost_setup_collection.hugepages:
+    size: 1G
+    nodes:
+      1: 48
+
+- name: Request boot-time allocation when runtime allocation fell short
+  tosin2013.qubinode_kvmhost_setup_collection.kernel_args:
+    args: "{{ kvmhost_kernel_args | default([]) + hugepages_result.boot_args }}"
+    apply: false
+  when: hugepages_result.boot_args | length > 0
+  notify: apply kernel arguments
+'''
+
+RETURN = r'''
+page_size:
+  description: Page size of the plan, C(2M) or C(1G).
+  returned: always
+  type: str
+page_size_kb:
+  description: Page size of the plan in KiB.
+  returned: always
+  type: int
+total:
+  description: Pages planned over all nodes.
+  returned: always
+  type: int
+allocated:
+  description: Pages of the planned size allocated over all nodes after the task.
+  returned: always
+  type: int
+nodes:
+  description: Plan and allocation of each node.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    node:
+      description: Node number.
+      type: int
+    pool:
+      description: Sysfs directory of the node's pool of the planned page size.
+      type: str
+    memtotal_mb:
+      description: Memory of the node.
+      type: int
+    target:
+      description: Pages planned for the node.
+      type: int
+    before:
+      description: Pages allocated before the task.
+      type: int
+    allocated:
+      description: Pages allocated after the task.
+      type: int
+    free:
+      description: Allocated pages not in use by a guest.
+      type: int
+    shortfall:
+      description: Pages that could not be allocated at runtime.
+      type: int
+boot_args:
+  description:
+    - Kernel arguments that reserve the plan at boot. Empty when the runtime allocation succeeded.
+    - The kernel spreads boot-time pages over the nodes; the per-node plan is applied again after boot.
+  returned: always
+  type: list
+  elements: str
+'''
+
+import glob
+import os
+import re
+
+from ansible.module_utils.basic import AnsibleModule
+
+PAGE_SIZES_KB = {'2M': 2048, '1G': 1048576}
+NODE_MEMTOTAL_RE = re.compile(r'MemTotal:\s+(\d+) kB')
+
+
+def read_int(path, default=None):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def write_value(module, path, value):
+    try:
+        with open(path, 'w') as f:
+            f.write('%s\n' % value)
+    except (IOError, OSError) as e:
+        module.fail_json(msg='Cannot write %s to %s: %s' % (value, path, e))
+
+
+def cpu_flags():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except (IOError, OSError):
+        pass
+    return set()
+
+
+def discover_nodes(sysfs):
+    """Map node number to (memory in kB, hugepages directory, compact file or None)."""
+    nodes = {}
+    for path in glob.glob(os.path.join(sysfs, 'devices/system/node/node[0-9]*')):
+        number = int(os.path.basename(path)[4:])
+        try:
+            with open(os.path.join(path, 'meminfo')) as f:
+                match = NODE_MEMTOTAL_RE.search(f.read())
+        except (IOError, OSError):
+            continue
+        # Memory-only nodes without hugepage support (and CPU-less nodes without memory) are skipped
+        if match and int(match.group(1)) and os.path.isdir(os.path.join(path, 'hugepages')):
+            compact = os.path.join(path, 'compact')
+            nodes[number] = (int(match.group(1)), os.path.join(path, 'hugepages'),
+                             compact if os.path.exists(compact) else None)
+    if nodes:
+        return nodes
+    with open('/proc/meminfo') as f:
+        match = NODE_MEMTOTAL_RE.search(f.read())
+    return {0: (int(match.group(1)), os.path.join(sysfs, 'kernel/mm/hugepages'), None)}
+
+
+def pool(directory, size_kb, name):
+    return os.path.join(directory, 'hugepages-%dkB' % size_kb, name)
+
+
+def supported(nodes, size_kb):
+    return all(os.path.isdir(os.path.join(directory, 'hugepages-%dkB' % size_kb))
+               for dummy, directory, dummy2 in nodes.values())
+
+
+def choose_size(module, nodes, percent):
+    size = module.params['size']
+    if size != 'auto':
+        if not supported(nodes, PAGE_SIZES_KB[size]):
+            module.fail_json(msg='The kernel has no %s hugepage pool' % size)
+        return size
+    gigantic = 'pdpe1gb' in cpu_flags() and supported(nodes, PAGE_SIZES_KB['1G'])
+    if gigantic and all(memory * percent / 100 >= PAGE_SIZES_KB['1G'] for memory, dummy, dummy2 in nodes.values()):
+        return '1G'
+    return '2M'
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            percent=dict(type='float', default=25),
+            size=dict(type='str', choices=['auto', '2M', '1G'], default='auto'),
+            nodes=dict(type='dict'),
+            exclusive=dict(type='bool', default=True),
+            apply=dict(type='bool', default=True),
+            sysfs=dict(type='path', default='/sys'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    if not 0 <= params['percent'] < 100:
+        module.fail_json(msg='percent must be at least 0 and below 100')
+
+    nodes = discover_nodes(params['sysfs'])
+    page_size = choose_size(module, nodes, params['percent'])
+    size_kb = PAGE_SIZES_KB[page_size]
+    other_kb = [kb for kb in PAGE_SIZES_KB.values() if kb != size_kb][0]
+    if params['nodes'] is not None:
+        try:
+            wanted = dict((int(node), int(count)) for node, count in params['nodes'].items())
+        except ValueError:
+            module.fail_json(msg='nodes must map node numbers to page counts')
+        unknown = sorted(set(wanted) - set(nodes))
+        if unknown:
+            module.fail_json(msg='Unknown NUMA nodes: %s' % ', '.join(str(node) for node in unknown))
+    else:
+        wanted = dict((node, int(memory * params['percent'] / 100 // size_kb))
+                      for node, (memory, dummy, dummy2) in nodes.items())
+
+    result = dict(changed=False, page_size=page_size, page_size_kb=size_kb, nodes=[], boot_args=[])
+    for node in sorted(nodes):
+        memory, directory, compact = nodes[node]
+        count_file = pool(directory, size_kb, 'nr_hugepages')
+        target = wanted.get(node, 0)
+        before = read_int(count_file, 0)
+        allocated = before
+        other_file = pool(directory, other_kb, 'nr_hugepages')
+        release = params['exclusive'] and read_int(other_file, 0) > 0
+
+        if (before != target or release) and params['apply']:
+            result['changed'] = True
+            if not module.check_mode:
+                # Freeing the other pool first returns its memory before this one grows
+                if release:
+                    write_value(module, other_file, 0)
+                # Compaction frees contiguous ranges; without it a 1G pool rarely grows on a busy host
+                if target > before and compact:
+                    write_value(module, compact, 1)
+                # The kernel allocates what it can and the count read back tells how many that was
+                write_value(module, count_file, target)
+                allocated = read_int(count_file, 0)
+
+        result['nodes'].append(dict(
+            node=node,
+            pool=os.path.dirname(count_file),
+            memtotal_mb=memory // 1024,
+            target=target,
+            before=before,
+            allocated=allocated,
+            free=read_int(pool(directory, size_kb, 'free_hugepages'), 0),
+            shortfall=max(target - allocated, 0),
+        ))
+
+    result['total'] = sum(node['target'] for node in result['nodes'])
+    result['allocated'] = sum(node['allocated'] for node in result['nodes'])
+    if params['apply'] and not module.check_mode and any(node['shortfall'] for node in result['nodes']):
+        result['boot_args'] = ['default_hugepagesz=%s' % page_size, 'hugepagesz=%s' % page_size,
+                               'hugepages=%d' % result['total']]
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
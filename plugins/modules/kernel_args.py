@@ -0,0 +1,337 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: kernel_args
+short_description: Merge kernel command line arguments into the boot configuration
+description:
+  - Adds, updates and removes individual kernel arguments while keeping every other argument,
+    instead of replacing the whole C(GRUB_CMDLINE_LINUX) line.
+  - On EL8 and newer the boot entries are updated with C(grubby --update-kernel); C(grubby) writes
+    the BLS entries directly, so no C(grub2-mkconfig) run is needed. Without C(grubby) the
+    arguments are merged into O(grub_defaults) and O(grub_cfg) is regenerated once.
+  - O(grub_defaults) and C(/etc/kernel/cmdline), when they exist, are merged as well so kernels
+    installed later boot with the same arguments.
+  - Roles collect their arguments with O(apply=false), which only merges the request into the
+    C(kvmhost_kernel_args) facts and reports whether applying it would change the boot
+    configuration. A single handler then applies all requests at once.
+version_added: "0.11.0"
+options:
+  args:
+    description:
+      - Arguments that must be present, as C(name) or C(name=value).
+      - An argument replaces any existing argument of the same name; when a name is given
+        several times the last one wins.
+    type: list
+    elements: str
+    default: []
+  remove:
+    description:
+      - Arguments to remove, by C(name) (any value) or C(name=value) (only that value).
+      - Names that are also in O(args) are kept.
+    type: list
+    elements: str
+    default: []
+  apply:
+    description:
+      - Whether to change the boot configuration.
+      - When false, only the facts are set and RV(changed) tells whether applying would change anything.
+    type: bool
+    default: true
+  kernel:
+    description:
+      - Boot entries to update, as accepted by C(grubby --update-kernel).
+    type: str
+    default: ALL
+  grub_defaults:
+    description:
+      - GRUB defaults file whose C(GRUB_CMDLINE_LINUX) is kept in sync.
+    type: path
+    default: /etc/default/grub
+  grub_cfg:
+    description:
+      - GRUB configuration regenerated with C(grub2-mkconfig) when C(grubby) is not available.
+    type: path
+    default: /boot/grub2/grub.cfg
+notes:
+  - Supports check mode and diff mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Request hugepage kernel arguments
+  tosin2013.qubinode_kvmhost_setup_collection.kernel_args:
+    args: "{{ kvmhost_kernel_args | default([]) + ['default_hugepagesz=1G', 'hugepagesz=1G', 'hugepages=16'] }}"
+    remove: "{{ kvmhost_kernel_args_remove | default([]) }}"
+    apply: false
+  notify: apply kernel arguments
+
+- name: Apply collected kernel arguments
+  tosin2013.qubinode_kvmhost_setup_collection.kernel_args:
+    args: "{{ kvmhost_kernel_args }}"
+    remove: "{{ kvmhost_kernel_args_remove }}"
+  register: kernel_args_result
+'''
+
+RETURN = r'''
+args:
+  description: Merged arguments that must be present.
+  returned: always
+  type: list
+  elements: str
+remove:
+  description: Merged arguments that must be absent.
+  returned: always
+  type: list
+  elements: str
+method:
+  description: How the boot configuration is updated, C(grubby) or C(grub2-mkconfig).
+  returned: always
+  type: str
+added:
+  description: Arguments added or changed in the boot configuration.
+  returned: always
+  type: list
+  elements: str
+removed:
+  description: Arguments removed from the boot configuration.
+  returned: always
+  type: list
+  elements: str
+cmdline:
+  description: Arguments of the default boot entry after the task.
+  returned: always
+  type: str
+reboot_required:
+  description: Whether the running kernel was booted without the wanted arguments, so a reboot is needed.
+  returned: always
+  type: bool
+ansible_facts:
+  description: The merged requests, for later requests and the final apply.
+  returned: always
+  type: dict
+  contains:
+    kvmhost_kernel_args:
+      description: Merged arguments that must be present.
+      type: list
+      elements: str
+    kvmhost_kernel_args_remove:
+      description: Merged arguments that must be absent.
+      type: list
+      elements: str
+'''
+
+import os
+import re
+import shlex
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+GRUB_CMDLINE_RE = re.compile(r'^GRUB_CMDLINE_LINUX=(.*)$', re.MULTILINE)
+KERNEL_CMDLINE = '/etc/kernel/cmdline'
+
+
+def arg_name(arg):
+    return arg.split('=', 1)[0]
+
+
+def split_args(text):
+    return shlex.split(text or '')
+
+
+def join_args(args):
+    return ' '.join(shlex.quote(arg) if ' ' in arg else arg for arg in args)
+
+
+def merge_requests(args, remove):
+    """Deduplicate args by name (last wins) and drop removals of names that are wanted."""
+    wanted = {}
+    for arg in args:
+        wanted.pop(arg_name(arg), None)
+        wanted[arg_name(arg)] = arg
+    unwanted = []
+    for arg in remove:
+        if arg_name(arg) not in wanted and arg not in unwanted:
+            unwanted.append(arg)
+    return list(wanted.values()), unwanted
+
+
+def is_removed(arg, remove):
+    return any(arg == item or (arg_name(arg) == item and '=' not in item) for item in remove)
+
+
+def merge_cmdline(current, args, remove):
+    """Return current with every arg set and every removal dropped, keeping order and other arguments."""
+    wanted = dict((arg_name(arg), arg) for arg in args)
+    result, placed = [], set()
+    for arg in current:
+        name = arg_name(arg)
+        if name in wanted:
+            if name not in placed:
+                result.append(wanted[name])
+                placed.add(name)
+        elif not is_removed(arg, remove):
+            result.append(arg)
+    result.extend(arg for name, arg in wanted.items() if name not in placed)
+    return result
+
+
+def changes(current, merged):
+    return [arg for arg in merged if arg not in current], [arg for arg in current if arg not in merged]
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def grubby_entries(module, grubby, kernel):
+    """Map each boot entry's kernel path to its argument list."""
+    rc, out, err = module.run_command([grubby, '--info=%s' % kernel])
+    if rc != 0:
+        module.fail_json(msg='grubby --info=%s failed: %s' % (kernel, err.strip() or out.strip()))
+    entries, path = {}, None
+    for line in out.splitlines():
+        key, dummy, value = line.partition('=')
+        value = value.strip().strip('"')
+        if key == 'kernel':
+            path = value
+        elif key == 'args' and path is not None:
+            entries[path] = split_args(value)
+    return entries
+
+
+def grubby_default(module, grubby):
+    rc, out, err = module.run_command([grubby, '--default-kernel'])
+    return out.strip() if rc == 0 else None
+
+
+def write_temp(module, content):
+    fd, path = tempfile.mkstemp(dir=module.tmpdir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return path
+
+
+def default_args_line(text):
+    """The unquoted value of GRUB_CMDLINE_LINUX, or None when the file does not set it."""
+    match = GRUB_CMDLINE_RE.search(text or '')
+    if match is None:
+        return None
+    return ' '.join(split_args(match.group(1)))
+
+
+def update_grub_defaults(text, args, remove):
+    match = GRUB_CMDLINE_RE.search(text)
+    if match is None:
+        return text.rstrip('\n') + '\nGRUB_CMDLINE_LINUX="%s"\n' % join_args(args)
+    merged = merge_cmdline(split_args(default_args_line(text)), args, remove)
+    return text[:match.start()] + 'GRUB_CMDLINE_LINUX="%s"' % join_args(merged) + text[match.end():]
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            args=dict(type='list', elements='str', default=[]),
+            remove=dict(type='list', elements='str', default=[]),
+            apply=dict(type='bool', default=True),
+            kernel=dict(type='str', default='ALL'),
+            grub_defaults=dict(type='path', default='/etc/default/grub'),
+            grub_cfg=dict(type='path', default='/boot/grub2/grub.cfg'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    args, remove = merge_requests(params['args'], params['remove'])
+    grubby = module.get_bin_path('grubby')
+    result = dict(
+        changed=False,
+        args=args,
+        remove=remove,
+        method='grubby' if grubby else 'grub2-mkconfig',
+        added=[],
+        removed=[],
+        ansible_facts=dict(kvmhost_kernel_args=args, kvmhost_kernel_args_remove=remove),
+    )
+
+    # Files that seed the command line of kernels installed later
+    files = {}
+    for path in (params['grub_defaults'], KERNEL_CMDLINE):
+        text = read_file(path)
+        if text is None:
+            continue
+        if path == KERNEL_CMDLINE:
+            new_text = join_args(merge_cmdline(split_args(text), args, remove)) + '\n'
+        else:
+            new_text = update_grub_defaults(text, args, remove)
+        if new_text != text:
+            files[path] = (text, new_text)
+
+    if grubby:
+        entries = grubby_entries(module, grubby, params['kernel'])
+        pending = dict((path, changes(current, merge_cmdline(current, args, remove)))
+                       for path, current in entries.items())
+        pending = dict((path, change) for path, change in pending.items() if change[0] or change[1])
+        default = entries.get(grubby_default(module, grubby), next(iter(entries.values()), []))
+    else:
+        if read_file(params['grub_defaults']) is None:
+            module.fail_json(msg='Neither grubby nor %s is available' % params['grub_defaults'], **result)
+        current = split_args(default_args_line(read_file(params['grub_defaults'])) or '')
+        pending = {}
+        if params['grub_defaults'] in files:
+            pending[params['grub_cfg']] = changes(current, merge_cmdline(current, args, remove))
+        default = current
+
+    after = merge_cmdline(default, args, remove)
+    result['added'], result['removed'] = changes(default, after)
+    for added, removed in pending.values():
+        result['added'] = sorted(set(result['added']) | set(added))
+        result['removed'] = sorted(set(result['removed']) | set(removed))
+    result['cmdline'] = join_args(after)
+    running = split_args(read_file('/proc/cmdline'))
+    result['reboot_required'] = bool(args or remove) and merge_cmdline(running, args, remove) != running
+    result['changed'] = bool(pending or files)
+
+    if module._diff and result['changed']:
+        result['diff'] = [dict(before_header=path, before=before, after_header=path, after=after_text)
+                          for path, (before, after_text) in files.items()]
+        result['diff'].append(dict(before_header='boot entries', before=join_args(default) + '\n',
+                                   after_header='boot entries', after=result['cmdline'] + '\n'))
+
+    if not result['changed'] or not params['apply'] or module.check_mode:
+        module.exit_json(**result)
+
+    for path, (before, after_text) in files.items():
+        module.atomic_move(write_temp(module, after_text), path)
+    if grubby:
+        for path, (added, removed) in pending.items():
+            cmd = [grubby, '--update-kernel=%s' % path]
+            if added:
+                cmd.append('--args=%s' % join_args(added))
+            # --args replaces other values of the same name itself
+            removed = [arg for arg in removed if arg_name(arg) not in set(arg_name(item) for item in added)]
+            if removed:
+                cmd.append('--remove-args=%s' % join_args(removed))
+            rc, out, err = module.run_command(cmd)
+            if rc != 0:
+                module.fail_json(msg='grubby failed for %s: %s' % (path, err.strip() or out.strip()), **result)
+    elif pending:
+        mkconfig = module.get_bin_path('grub2-mkconfig', required=True)
+        rc, out, err = module.run_command([mkconfig, '-o', params['grub_cfg']])
+        if rc != 0:
+            module.fail_json(msg='grub2-mkconfig failed: %s' % err.strip(), **result)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
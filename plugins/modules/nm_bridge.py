@@ -0,0 +1,364 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: nm_bridge
+short_description: Configure a NetworkManager bridge and its port over D-Bus with checkpoint rollback
+description:
+  - Talks to NetworkManager over D-Bus in one session instead of running C(nmcli) repeatedly and
+    parsing its output.
+  - Reads the connection currently active on the port interface and, when the bridge is created,
+    copies its IPv4 and IPv6 configuration to the bridge.
+  - Creates or updates the bridge connection and its port connection, and disables autoconnect on
+    the previous connection of the port interface so it does not take the interface back on boot.
+  - All changes are made inside a NetworkManager checkpoint. If the bridge does not come up (and
+    obtain an IPv4 address, unless IPv4 is disabled) within O(activation_timeout), the checkpoint is
+    rolled back. If the module itself is cut off, for example because the SSH session ran over the
+    port interface, NetworkManager rolls back on its own after O(rollback_timeout).
+  - Optionally sets the MTU of the bridge and its port, and ethtool offload and ring buffer settings
+    of the port, in the connection profiles so they persist across reboots.
+  - Returns structured state from before and after the change.
+version_added: "0.11.0"
+options:
+  bridge:
+    description:
+      - Bridge interface name, also used as the bridge connection name.
+    type: str
+    required: true
+  port:
+    description:
+      - Interface to attach to the bridge.
+      - Required when O(state=present).
+    type: str
+  state:
+    description:
+      - C(present) creates or updates the bridge and its port.
+      - C(query) only reports the current state.
+    type: str
+    choices: [present, query]
+    default: present
+  stp:
+    description: Enable the spanning tree protocol on the bridge.
+    type: bool
+    default: false
+  forward_delay:
+    description: STP forward delay in seconds.
+    type: int
+    default: 0
+  hello_time:
+    description: STP hello time in seconds.
+    type: int
+    default: 2
+  max_age:
+    description: STP maximum message age in seconds.
+    type: int
+    default: 20
+  priority:
+    description: STP bridge priority.
+    type: int
+    default: 32768
+  ipv4_method:
+    description:
+      - IPv4 method of the bridge.
+      - When omitted, the IPv4 configuration of the port's current connection is copied to a new
+        bridge, and the IPv4 configuration of an existing bridge is left unchanged.
+    type: str
+    choices: [auto, manual, disabled, link-local]
+  ipv4_addresses:
+    description: Static addresses in CIDR notation, used with O(ipv4_method=manual).
+    type: list
+    elements: str
+  ipv4_gateway:
+    description: IPv4 gateway, used with O(ipv4_method=manual).
+    type: str
+  ipv4_dns:
+    description: IPv4 DNS servers.
+    type: list
+    elements: str
+  ipv6_method:
+    description:
+      - IPv6 method of the bridge. When omitted it is copied or left unchanged like O(ipv4_method).
+    type: str
+    choices: [auto, dhcp, manual, ignore, disabled, link-local]
+  mtu:
+    description:
+      - MTU of the bridge and its port, for example C(9000) for jumbo frames.
+      - When omitted, the MTU of existing connections is left unchanged.
+    type: int
+  port_ethtool:
+    description:
+      - ethtool settings of the port connection, keyed by NetworkManager C(ethtool) property name.
+      - C(feature-*) keys take a boolean, for example C(feature-gro), C(feature-tso) and C(feature-gso).
+      - C(ring-*) and C(coalesce-*) keys take an integer, for example C(ring-rx) and C(ring-tx).
+      - Settings that are not listed are left unchanged.
+    type: dict
+    default: {}
+  activation_timeout:
+    description: Seconds to wait for the bridge to become active before rolling back.
+    type: int
+    default: 30
+  rollback_timeout:
+    description:
+      - Seconds after which NetworkManager rolls back the checkpoint by itself if the module does
+        not confirm the change. Must be larger than O(activation_timeout).
+    type: int
+    default: 90
+requirements:
+  - python3-dbus
+  - NetworkManager 1.12 or later, 1.26 or later for C(ring-*) keys in O(port_ethtool)
+notes:
+  - Supports check mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Bridge the primary interface, keeping its addresses
+  tosin2013.qubinode_kvmhost_setup_collection.nm_bridge:
+    bridge: qubibr0
+    port: "{{ ansible_default_ipv4.interface }}"
+  register: bridge_result
+
+- name: Jumbo frames and offloads on the bridge port
+  tosin2013.qubinode_kvmhost_setup_collection.nm_bridge:
+    bridge: qubibr0
+    port: eno1
+    mtu: 9000
+    port_ethtool:
+      feature-gro: true
+      feature-tso: true
+      ring-rx: 4096
+
+- name: Report the bridge state
+  tosin2013.qubinode_kvmhost_setup_collection.nm_bridge:
+    bridge: qubibr0
+    port: eno1
+    state: query
+  register: bridge_state
+'''
+
+RETURN = r'''
+before:
+  description: State before the change.
+  returned: always
+  type: dict
+  contains:
+    bridge:
+      description: Bridge connection and device, C(null) when the bridge connection does not exist.
+      type: dict
+    port:
+      description: Port connection of O(port), C(null) when it does not exist.
+      type: dict
+    primary:
+      description: Connection active on O(port) when it is not the bridge port, C(null) otherwise.
+      type: dict
+after:
+  description: State after the change, same layout as RV(before).
+  returned: always
+  type: dict
+actions:
+  description: Actions taken, from C(bridge_created), C(bridge_updated), C(port_created), C(port_updated),
+    C(primary_autoconnect_disabled) and C(activated).
+  returned: always
+  type: list
+  elements: str
+rolled_back:
+  description: Whether the checkpoint was rolled back because the bridge did not come up.
+  returned: always
+  type: bool
+'''
+
+import uuid
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.nm import (
+    CHECKPOINT_ARGUMENT_SPEC,
+    CONNECTION_IFACE,
+    DEVICE_STATE_ACTIVATED,
+    ETHERNET_TYPE,
+    IP_ARGUMENT_SPEC,
+    ActivationError,
+    NetworkManager,
+    check_requirements,
+    dbus,
+    describe,
+    differs,
+    ethtool_settings,
+    ip_settings,
+    primary_connection,
+    sections,
+    unwrap,
+    wait_active,
+)
+
+def find_connections(nm, params):
+    """Locate the bridge, port and primary connections and the port device."""
+    connections = nm.connections()
+    bridge = port = None
+    for path, (raw, plain) in connections.items():
+        conn = plain.get('connection', {})
+        if conn.get('type') == 'bridge' and params['bridge'] in (conn.get('id'), conn.get('interface-name')):
+            bridge = path
+    bridge_refs = set([params['bridge']])
+    if bridge is not None:
+        bridge_refs.add(connections[bridge][1]['connection'].get('uuid'))
+    for path, (raw, plain) in connections.items():
+        conn = plain.get('connection', {})
+        if (params['port'] and conn.get('interface-name') == params['port']
+                and conn.get('slave-type') == 'bridge' and conn.get('master') in bridge_refs):
+            port = path
+
+    port_device = nm.device(params['port']) if params['port'] else None
+    primary = primary_connection(nm, connections, params['port'], exclude=(port,)) if port_device else None
+    return connections, bridge, port, primary, port_device
+
+
+def snapshot(nm, params):
+    connections, bridge, port, primary, port_device = find_connections(nm, params)
+    state = dict(
+        bridge=describe(bridge, connections[bridge][1]) if bridge else None,
+        port=describe(port, connections[port][1]) if port else None,
+        primary=describe(primary, connections[primary][1]) if primary else None,
+    )
+    bridge_device = nm.device(params['bridge'])
+    if state['bridge'] is not None:
+        info = nm.device_info(bridge_device) if bridge_device else dict(state=0, active_uuid=None, addresses=[])
+        state['bridge'].update(
+            device_state=info['state'],
+            active=info['state'] == DEVICE_STATE_ACTIVATED,
+            live_addresses=info['addresses'],
+        )
+    if port_device is not None and state['port'] is not None:
+        state['port']['active'] = nm.device_info(port_device)['active_uuid'] == state['port']['uuid']
+    return state
+
+
+def desired_settings(params, copy_from):
+    """Desired bridge settings as {section: {key: (plain, dbus)}}."""
+    bridge = {
+        'stp': (params['stp'], dbus.Boolean(params['stp'])),
+        'forward-delay': (params['forward_delay'], dbus.UInt32(params['forward_delay'])),
+        'hello-time': (params['hello_time'], dbus.UInt32(params['hello_time'])),
+        'max-age': (params['max_age'], dbus.UInt32(params['max_age'])),
+        'priority': (params['priority'], dbus.UInt32(params['priority'])),
+    }
+    desired = {'bridge': bridge}
+    desired.update(ip_settings(params, copy_from))
+    if params['mtu'] is not None:
+        desired[ETHERNET_TYPE] = {'mtu': (params['mtu'], dbus.UInt32(params['mtu']))}
+    return desired
+
+
+def desired_port_settings(module, params):
+    """Desired port settings, same layout as desired_settings."""
+    desired = {'connection': {'autoconnect': (True, dbus.Boolean(True))}}
+    if params['mtu'] is not None:
+        desired[ETHERNET_TYPE] = {'mtu': (params['mtu'], dbus.UInt32(params['mtu']))}
+    if params['port_ethtool']:
+        desired['ethtool'] = ethtool_settings(module, params['port_ethtool'])
+    return desired
+
+
+def apply(module, nm, params, before):
+    connections, bridge, port, primary, port_device = find_connections(nm, params)
+    copy_from = before['primary'] if bridge is None else None
+    desired = desired_settings(params, copy_from)
+    port_desired = desired_port_settings(module, params)
+    changes = []
+
+    if bridge is None:
+        changes.append('bridge_created')
+    elif differs(desired, connections[bridge][1]):
+        changes.append('bridge_updated')
+    if port is None:
+        changes.append('port_created')
+    elif differs(port_desired, connections[port][1]):
+        changes.append('port_updated')
+    if primary is not None and connections[primary][1]['connection'].get('interface-name') == params['port'] \
+            and connections[primary][1]['connection'].get('autoconnect', True):
+        changes.append('primary_autoconnect_disabled')
+    running = before['bridge'] is not None and before['bridge']['active'] \
+        and before['port'] is not None and before['port'].get('active', False)
+    if changes or not running:
+        changes.append('activated')
+
+    if module.check_mode or not changes:
+        return changes
+
+    checkpoint = nm.checkpoint(params['rollback_timeout'])
+    try:
+        if bridge is None:
+            bridge = nm.add(sections({'id': params['bridge'], 'uuid': str(uuid.uuid4()), 'type': 'bridge',
+                                      'interface-name': params['bridge'], 'autoconnect': dbus.Boolean(True)}, desired))
+        elif 'bridge_updated' in changes:
+            nm.update(bridge, connections[bridge][0], desired)
+        bridge_uuid = str(nm.iface(bridge, CONNECTION_IFACE).GetSettings()['connection']['uuid'])
+
+        if port is None:
+            port = nm.add(sections({
+                'id': '%s-bridge-slave' % params['port'], 'uuid': str(uuid.uuid4()), 'type': ETHERNET_TYPE,
+                'interface-name': params['port'], 'master': bridge_uuid, 'slave-type': 'bridge'}, port_desired))
+        elif 'port_updated' in changes:
+            nm.update(port, connections[port][0], port_desired)
+
+        if 'primary_autoconnect_disabled' in changes:
+            nm.update(primary, connections[primary][0], {'connection': {'autoconnect': (False, dbus.Boolean(False))}})
+
+        # Activating the port brings up its bridge as well, but a bridge that is already up keeps its
+        # old settings until it is activated again
+        if 'bridge_updated' in changes and before['bridge']['active']:
+            nm.activate(bridge)
+        nm.activate(port, port_device)
+        method = unwrap(nm.iface(bridge, CONNECTION_IFACE).GetSettings()).get('ipv4', {}).get('method')
+        wait_active(nm, params['bridge'], method in ('auto', 'manual'), params['activation_timeout'])
+    except (dbus.exceptions.DBusException, ActivationError) as e:
+        nm.rollback(checkpoint)
+        module.fail_json(msg='Bridge configuration rolled back: %s' % e, rolled_back=True, before=before,
+                         actions=changes)
+    nm.nm.CheckpointDestroy(checkpoint)
+    return changes
+
+
+def main():
+    argument_spec = dict(
+        bridge=dict(type='str', required=True),
+        port=dict(type='str'),
+        state=dict(type='str', default='present', choices=['present', 'query']),
+        stp=dict(type='bool', default=False),
+        forward_delay=dict(type='int', default=0),
+        hello_time=dict(type='int', default=2),
+        max_age=dict(type='int', default=20),
+        priority=dict(type='int', default=32768),
+        mtu=dict(type='int'),
+        port_ethtool=dict(type='dict', default={}),
+    )
+    argument_spec.update(IP_ARGUMENT_SPEC)
+    argument_spec.update(CHECKPOINT_ARGUMENT_SPEC)
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_if=[('state', 'present', ['port'])],
+        supports_check_mode=True,
+    )
+    params = module.params
+    check_requirements(module)
+
+    try:
+        nm = NetworkManager()
+        before = snapshot(nm, params)
+        if params['state'] == 'present' and nm.device(params['port']) is None:
+            module.fail_json(msg='Interface %s is not managed by NetworkManager' % params['port'], before=before)
+        actions = apply(module, nm, params, before) if params['state'] == 'present' else []
+        after = snapshot(nm, params) if actions and not module.check_mode else before
+    except dbus.exceptions.DBusException as e:
+        module.fail_json(msg='NetworkManager D-Bus error: %s' % e)
+
+    module.exit_json(changed=bool(actions), actions=actions, before=before, after=after, rolled_back=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: nm_ovs_bridge
+short_description: Configure an Open vSwitch bridge with its uplink and VLAN ports through NetworkManager
+description:
+  - Builds an Open vSwitch bridge from NetworkManager C(ovs-bridge), C(ovs-port) and C(ovs-interface)
+    connections over D-Bus, so the bridge is persistent and managed like any other NetworkManager
+    profile.
+  - The uplink interface is attached through its own port. The host keeps its address on an internal
+    interface named after the bridge; when that interface is created, the IPv4 and IPv6 configuration
+    of the connection currently active on the uplink is copied to it.
+  - Each entry of O(vlans) becomes an access port tagged with the VLAN ID and an internal interface,
+    so one bridge carries every VLAN instead of one Linux bridge per VLAN.
+  - Connections are named C(<bridge>-port-<name>) and C(<bridge>-iface-<name>) and are only
+    updated when their settings differ.
+  - All changes are made inside a NetworkManager checkpoint that is rolled back if the internal
+    interface does not come up, like M(tosin2013.qubinode_kvmhost_setup_collection.nm_bridge).
+version_added: "0.11.0"
+options:
+  bridge:
+    description:
+      - OVS bridge name, also the name of the host's internal interface.
+    type: str
+    required: true
+  uplink:
+    description:
+      - Physical interface to attach to the bridge.
+      - Required when O(state=present).
+    type: str
+  state:
+    description:
+      - C(present) creates or updates the bridge, its ports and interfaces.
+      - C(query) only reports the current state.
+    type: str
+    choices: [present, query]
+    default: present
+  stp:
+    description: Enable the spanning tree protocol on the bridge.
+    type: bool
+    default: false
+  mtu:
+    description:
+      - MTU of the uplink and of every internal interface.
+      - When omitted, the MTU of existing connections is left unchanged.
+    type: int
+  uplink_ethtool:
+    description:
+      - ethtool settings of the uplink connection, keyed by NetworkManager C(ethtool) property name,
+        as in O(tosin2013.qubinode_kvmhost_setup_collection.nm_bridge#module:port_ethtool).
+    type: dict
+    default: {}
+  vlans:
+    description:
+      - VLANs to give an access port and internal interface on the bridge.
+      - Guests do not need these; libvirt tags guest ports itself through network portgroups.
+    type: list
+    elements: dict
+    default: []
+    suboptions:
+      id:
+        description: VLAN ID.
+        type: int
+        required: true
+      name:
+        description: Internal interface name, at most 15 characters.
+        type: str
+      ipv4_method:
+        description: IPv4 method of the VLAN interface.
+        type: str
+        choices: [auto, manual, disabled, link-local]
+        default: disabled
+      ipv4_addresses:
+        description: Static addresses in CIDR notation, used with O(vlans[].ipv4_method=manual).
+        type: list
+        elements: str
+  ipv4_method:
+    description:
+      - IPv4 method of the internal interface.
+      - When omitted, the IPv4 configuration of the uplink's current connection is copied to a new
+        internal interface, and an existing one is left unchanged.
+    type: str
+    choices: [auto, manual, disabled, link-local]
+  ipv4_addresses:
+    description: Static addresses in CIDR notation, used with O(ipv4_method=manual).
+    type: list
+    elements: str
+  ipv4_gateway:
+    description: IPv4 gateway, used with O(ipv4_method=manual).
+    type: str
+  ipv4_dns:
+    description: IPv4 DNS servers.
+    type: list
+    elements: str
+  ipv6_method:
+    description:
+      - IPv6 method of the internal interface. When omitted it is copied or left unchanged like O(ipv4_method).
+    type: str
+    choices: [auto, dhcp, manual, ignore, disabled, link-local]
+  activation_timeout:
+    description: Seconds to wait for the internal interface to become active before rolling back.
+    type: int
+    default: 30
+  rollback_timeout:
+    description:
+      - Seconds after which NetworkManager rolls back the checkpoint by itself if the module does
+        not confirm the change. Must be larger than O(activation_timeout).
+    type: int
+    default: 90
+requirements:
+  - python3-dbus
+  - NetworkManager-ovs and a running openvswitch service
+notes:
+  - Supports check mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: OVS bridge on the primary interface with two VLANs
+  tosin2013.qubinode_kvmhost_setup_collection.nm_ovs_bridge:
+    bridge: qubibr0
+    uplink: "{{ ansible_default_ipv4.interface }}"
+    vlans:
+      - id: 100
+      - id: 200
+        name: storage
+        ipv4_method: manual
+        ipv4_addresses: [10.20.0.5/24]
+  register: ovs_result
+
+- name: Report the bridge state
+  tosin2013.qubinode_kvmhost_setup_collection.nm_ovs_bridge:
+    bridge: qubibr0
+    state: query
+'''
+
+RETURN = r'''
+before:
+  description: State before the change.
+  returned: always
+  type: dict
+  contains:
+    connections:
+      description: The bridge's connections in creation order, each with C(id), C(type), C(interface),
+        C(master), C(ipv4) and C(mtu).
+      type: list
+      elements: dict
+    interface:
+      description: Internal interface device with C(active), C(device_state) and C(live_addresses),
+        C(null) when it does not exist.
+      type: dict
+    primary:
+      description: Connection active on O(uplink) when it is not the bridge's uplink connection.
+      type: dict
+after:
+  description: State after the change, same layout as RV(before).
+  returned: always
+  type: dict
+actions:
+  description: Actions taken, C(created:<id>), C(updated:<id>), C(primary_autoconnect_disabled) and
+    C(activated).
+  returned: always
+  type: list
+  elements: str
+rolled_back:
+  description: Whether the checkpoint was rolled back because the bridge did not come up.
+  returned: always
+  type: bool
+'''
+
+import uuid
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.nm import (
+    CHECKPOINT_ARGUMENT_SPEC,
+    CONNECTION_IFACE,
+    DEVICE_STATE_ACTIVATED,
+    ETHERNET_TYPE,
+    IP_ARGUMENT_SPEC,
+    ActivationError,
+    NetworkManager,
+    check_requirements,
+    dbus,
+    describe,
+    differs,
+    ethtool_settings,
+    ip_settings,
+    primary_connection,
+    sections,
+    unwrap,
+    wait_active,
+)
+
+
+def plan(module, params, copy_from):
+    """Connections of the bridge as (id, type, interface, master id, desired settings), parents first."""
+    bridge = params['bridge']
+    mtu = {}
+    if params['mtu'] is not None:
+        mtu = {ETHERNET_TYPE: {'mtu': (params['mtu'], dbus.UInt32(params['mtu']))}}
+    internal = {'ovs-interface': {'type': ('internal', dbus.String('internal'))}}
+    entries = [(bridge, 'ovs-bridge', bridge, None,
+                {'ovs-bridge': {'stp-enable': (params['stp'], dbus.Boolean(params['stp']))}})]
+
+    uplink = params['uplink']
+    if uplink:
+        uplink_settings = dict(mtu)
+        if params['uplink_ethtool']:
+            uplink_settings['ethtool'] = ethtool_settings(module, params['uplink_ethtool'])
+        entries.append(('%s-port-%s' % (bridge, uplink), 'ovs-port', uplink, bridge, {}))
+        entries.append(('%s-iface-%s' % (bridge, uplink), ETHERNET_TYPE, uplink, '%s-port-%s' % (bridge, uplink),
+                        uplink_settings))
+
+    host = dict(internal, **mtu)
+    host.update(ip_settings(params, copy_from))
+    entries.append(('%s-port-%s' % (bridge, bridge), 'ovs-port', bridge, bridge, {}))
+    entries.append(('%s-iface-%s' % (bridge, bridge), 'ovs-interface', bridge, '%s-port-%s' % (bridge, bridge), host))
+
+    for vlan in params['vlans']:
+        name = vlan['name'] or 'vlan%d' % vlan['id']
+        vlan_ip = dict(ipv4_method=vlan['ipv4_method'], ipv4_addresses=vlan['ipv4_addresses'], ipv4_gateway=None,
+                       ipv4_dns=None, ipv6_method='ignore')
+        settings = dict(internal, **mtu)
+        settings.update(ip_settings(vlan_ip, None))
+        entries.append(('%s-port-%s' % (bridge, name), 'ovs-port', name, bridge,
+                        {'ovs-port': {'tag': (vlan['id'], dbus.UInt32(vlan['id'])),
+                                      'vlan-mode': ('access', dbus.String('access'))}}))
+        entries.append(('%s-iface-%s' % (bridge, name), 'ovs-interface', name, '%s-port-%s' % (bridge, name),
+                        settings))
+    return entries
+
+
+def find_connections(nm, params):
+    """Existing connections by id, and the primary connection of the uplink."""
+    connections = nm.connections()
+    by_id = {}
+    for path, (raw, plain) in connections.items():
+        by_id.setdefault(plain['connection'].get('id'), path)
+    ours = set(path for conn_id, path in by_id.items() if conn_id and conn_id.startswith(params['bridge']))
+    primary = primary_connection(nm, connections, params['uplink'], exclude=ours) if params['uplink'] else None
+    return connections, by_id, primary
+
+
+def snapshot(module, nm, params):
+    connections, by_id, primary = find_connections(nm, params)
+    ids = [entry[0] for entry in plan(module, params, None)]
+    state = dict(
+        connections=[describe(by_id[conn_id], connections[by_id[conn_id]][1]) for conn_id in ids if conn_id in by_id],
+        interface=None,
+        primary=describe(primary, connections[primary][1]) if primary else None,
+    )
+    device = nm.device(params['bridge'])
+    if device is not None:
+        info = nm.device_info(device)
+        state['interface'] = dict(device_state=info['state'], active=info['state'] == DEVICE_STATE_ACTIVATED,
+                                  active_uuid=info['active_uuid'], live_addresses=info['addresses'])
+    return state
+
+
+def apply(module, nm, params, before):
+    connections, by_id, primary = find_connections(nm, params)
+    host_iface = '%s-iface-%s' % (params['bridge'], params['bridge'])
+    copy_from = before['primary'] if host_iface not in by_id else None
+    entries = plan(module, params, copy_from)
+    changes = []
+
+    for conn_id, conn_type, ifname, master, desired in entries:
+        path = by_id.get(conn_id)
+        if path is None:
+            changes.append('created:%s' % conn_id)
+        elif differs(dict(desired, connection={'autoconnect': (True, None)}), connections[path][1]):
+            changes.append('updated:%s' % conn_id)
+    if primary is not None and connections[primary][1]['connection'].get('interface-name') == params['uplink'] \
+            and connections[primary][1]['connection'].get('autoconnect', True):
+        changes.append('primary_autoconnect_disabled')
+    uplink_iface = by_id.get('%s-iface-%s' % (params['bridge'], params['uplink']))
+    uplink_active = uplink_iface is not None and \
+        nm.device_info(nm.device(params['uplink']))['active_uuid'] == connections[uplink_iface][1]['connection']['uuid']
+    running = before['interface'] is not None and before['interface']['active'] and uplink_active
+    if changes or not running:
+        changes.append('activated')
+
+    if module.check_mode or not changes:
+        return changes
+
+    checkpoint = nm.checkpoint(params['rollback_timeout'])
+    try:
+        uuids = {}
+        paths = {}
+        for conn_id, conn_type, ifname, master, desired in entries:
+            path = by_id.get(conn_id)
+            desired = dict(desired)
+            desired['connection'] = {'autoconnect': (True, dbus.Boolean(True))}
+            if master is not None:
+                slave_type = 'ovs-bridge' if conn_type == 'ovs-port' else 'ovs-port'
+                desired['connection'].update({'master': (uuids[master], dbus.String(uuids[master])),
+                                              'slave-type': (slave_type, dbus.String(slave_type))})
+            if path is None:
+                path = nm.add(sections({'id': conn_id, 'uuid': str(uuid.uuid4()), 'type': conn_type,
+                                        'interface-name': ifname}, desired))
+            elif differs(desired, connections[path][1]):
+                # Also catches a master that was recreated with a new uuid
+                nm.update(path, connections[path][0], desired)
+            paths[conn_id] = path
+            uuids[conn_id] = str(nm.iface(path, CONNECTION_IFACE).GetSettings()['connection']['uuid'])
+
+        if 'primary_autoconnect_disabled' in changes:
+            nm.update(primary, connections[primary][0], {'connection': {'autoconnect': (False, dbus.Boolean(False))}})
+
+        # Activating an interface brings up its port and the bridge as well
+        if params['uplink']:
+            nm.activate(paths['%s-iface-%s' % (params['bridge'], params['uplink'])], nm.device(params['uplink']))
+        for conn_id, conn_type, ifname, master, desired in entries:
+            if conn_type == 'ovs-interface':
+                nm.activate(paths[conn_id])
+        method = unwrap(nm.iface(paths[host_iface], CONNECTION_IFACE).GetSettings()).get('ipv4', {}).get('method')
+        wait_active(nm, params['bridge'], method in ('auto', 'manual'), params['activation_timeout'])
+    except (dbus.exceptions.DBusException, ActivationError) as e:
+        nm.rollback(checkpoint)
+        module.fail_json(msg='OVS bridge configuration rolled back: %s' % e, rolled_back=True, before=before,
+                         actions=changes)
+    nm.nm.CheckpointDestroy(checkpoint)
+    return changes
+
+
+def main():
+    argument_spec = dict(
+        bridge=dict(type='str', required=True),
+        uplink=dict(type='str'),
+        state=dict(type='str', default='present', choices=['present', 'query']),
+        stp=dict(type='bool', default=False),
+        mtu=dict(type='int'),
+        uplink_ethtool=dict(type='dict', default={}),
+        vlans=dict(
+            type='list',
+            elements='dict',
+            default=[],
+            options=dict(
+                id=dict(type='int', required=True),
+                name=dict(type='str'),
+                ipv4_method=dict(type='str', default='disabled', choices=['auto', 'manual', 'disabled', 'link-local']),
+                ipv4_addresses=dict(type='list', elements='str'),
+            ),
+        ),
+    )
+    argument_spec.update(IP_ARGUMENT_SPEC)
+    argument_spec.update(CHECKPOINT_ARGUMENT_SPEC)
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_if=[('state', 'present', ['uplink'])],
+        supports_check_mode=True,
+    )
+    params = module.params
+    check_requirements(module)
+    for vlan in params['vlans']:
+        name = vlan['name'] or 'vlan%d' % vlan['id']
+        if not 1 <= vlan['id'] <= 4094 or len(name) > 15:
+            module.fail_json(msg='VLAN %s: the ID must be 1-4094 and the name at most 15 characters' % name)
+
+    try:
+        nm = NetworkManager()
+        before = snapshot(module, nm, params)
+        if params['state'] == 'present' and nm.device(params['uplink']) is None:
+            module.fail_json(msg='Interface %s is not managed by NetworkManager' % params['uplink'], before=before)
+        actions = apply(module, nm, params, before) if params['state'] == 'present' else []
+        after = snapshot(module, nm, params) if actions and not module.check_mode else before
+    except dbus.exceptions.DBusException as e:
+        module.fail_json(msg='NetworkManager D-Bus error: %s' % e)
+
+    module.exit_json(changed=bool(actions), actions=actions, before=before, after=after, rolled_back=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: qemu_conf
+short_description: Manage settings of the libvirt QEMU driver configuration
+description:
+  - Sets and removes individual settings in C(/etc/libvirt/qemu.conf), keeping comments and every
+    other setting. Strings, integers, booleans and lists are written in the libvirt configuration syntax.
+  - The file is rewritten only when the effective settings differ from the wanted ones, so
+    RV(changed) means the QEMU driver daemon needs a restart to pick them up. Formatting and
+    comments alone never cause a change.
+  - With O(validate=true) the settings are checked against the host before anything is written.
+    Keys and value types are checked against the C(libvirtd_qemu.aug) lens of the installed libvirt,
+    C(hugetlbfs_mount) paths must be mounted hugetlbfs file systems, C(memory_backing_dir) must
+    exist and C(max_files) must not exceed C(fs.nr_open). In check mode the mount and directory
+    checks are skipped, since the tasks that would mount and create them did not run either.
+version_added: "0.11.0"
+options:
+  settings:
+    description:
+      - Settings by name. A null value removes the setting, so libvirt uses its built-in default.
+    type: dict
+    required: true
+  path:
+    description:
+      - QEMU driver configuration file.
+    type: path
+    default: /etc/libvirt/qemu.conf
+  validate:
+    description:
+      - Whether to check the settings against the installed libvirt and the host.
+    type: bool
+    default: true
+  lens:
+    description:
+      - Augeas lens of the installed libvirt describing the known settings. Key checks are
+        skipped when it does not exist.
+    type: path
+    default: /usr/share/augeas/lenses/libvirtd_qemu.aug
+  proc:
+    description:
+      - Mount point of procfs.
+    type: path
+    default: /proc
+notes:
+  - Supports check mode and diff mode.
+  - Settings apply to guests started after the daemon restart.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Configure the QEMU driver
+  tosin2013.qubinode_kvmhost_setup_collection.qemu_conf:
+    settings:
+      hugetlbfs_mount: [/dev/hugepages, /dev/hugepages1G]
+      memory_backing_dir: /var/lib/libvirt/qemu/ram
+      max_files: 32768
+      cgroup_device_acl: null
+  notify: restart qemu driver
+'''
+
+RETURN = r'''
+settings:
+  description: Effective values of the managed settings after the task; removed settings are null.
+  returned: always
+  type: dict
+updated:
+  description: Settings added or changed.
+  returned: always
+  type: list
+  elements: str
+removed:
+  description: Settings removed.
+  returned: always
+  type: list
+  elements: str
+hugetlbfs:
+  description: hugetlbfs mounts of C(hugetlbfs_mount) with their page size.
+  returned: always
+  type: list
+  elements: dict
+  sample: [{"path": "/dev/hugepages1G", "pagesize": "1G"}]
+qemu:
+  description: Path and version of the installed QEMU, when found.
+  returned: always
+  type: dict
+  sample: {"path": "/usr/libexec/qemu-kvm", "version": "9.1.0"}
+'''
+
+import os
+import re
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+KEY_RE = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*=')
+LENS_RE = re.compile(r'\b(str|int|bool|str_array)_entry\s+"([A-Za-z0-9_]+)"')
+QEMU_BINARIES = ('/usr/libexec/qemu-kvm', '/usr/bin/qemu-kvm', '/usr/bin/qemu-system-x86_64')
+QEMU_VERSION_RE = re.compile(r'version (\d+\.\d+(?:\.\d+)?)')
+MANAGED_HEADER = '# Managed by Ansible (qemu_conf)'
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def parse_value(text):
+    """Parse a libvirt configuration value: "string", integer or [ list of values ]."""
+    text = text.strip()
+    if text.startswith('['):
+        items, rest = [], text[1:]
+        while True:
+            rest = rest.lstrip().lstrip(',').lstrip()
+            if not rest or rest.startswith(']'):
+                return items
+            item, rest = take_value(rest)
+            items.append(item)
+    return take_value(text)[0]
+
+
+def take_value(text):
+    if text.startswith('"'):
+        chars, i = [], 1
+        while i < len(text) and text[i] != '"':
+            if text[i] == '\\' and i + 1 < len(text):
+                i += 1
+            chars.append(text[i])
+            i += 1
+        return ''.join(chars), text[i + 1:]
+    match = re.match(r'-?\d+', text)
+    if match:
+        return int(match.group(0)), text[match.end():]
+    raise ValueError('cannot parse value %r' % text)
+
+
+def strip_comment(line):
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"' and (i == 0 or line[i - 1] != '\\'):
+            quoted = not quoted
+        elif char == '#' and not quoted:
+            return line[:i]
+    return line
+
+
+def assignments(lines):
+    """Map each active setting to its spans: (first line, line after the value, value text)."""
+    found, i = {}, 0
+    while i < len(lines):
+        match = KEY_RE.match(lines[i])
+        if not match:
+            i += 1
+            continue
+        start, text = i, strip_comment(lines[i][match.end():])
+        # A list value continues until its brackets close
+        while text.count('[') > text.count(']') and i + 1 < len(lines):
+            i += 1
+            text += '\n' + strip_comment(lines[i])
+        found.setdefault(match.group(1), []).append((start, i + 1, text))
+        i += 1
+    return found
+
+
+def effective(lines):
+    values = {}
+    for key, spans in assignments(lines).items():
+        # libvirt keeps the last assignment of a key
+        values[key] = parse_value(spans[-1][2])
+    return values
+
+
+def quote(value):
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, list):
+        return '[ %s ]' % ', '.join(quote(str(item)) for item in value)
+    return quote(str(value))
+
+
+def normalize(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    if isinstance(value, str) and re.match(r'^-?\d+$', value):
+        return int(value)
+    return value
+
+
+def update(lines, settings):
+    spans = assignments(lines)
+    replace, drop = {}, set()
+    for key, value in settings.items():
+        for index, (start, end, dummy) in enumerate(spans.get(key, [])):
+            drop.update(range(start, end))
+            if index == 0 and value is not None:
+                replace[start] = '%s = %s' % (key, format_value(value))
+    result = []
+    for number, line in enumerate(lines):
+        if number in replace:
+            result.append(replace[number])
+        elif number not in drop:
+            result.append(line)
+    new = ['%s = %s' % (key, format_value(value)) for key, value in sorted(settings.items())
+           if value is not None and key not in spans]
+    if new:
+        if MANAGED_HEADER not in result:
+            result.extend(['', MANAGED_HEADER])
+        result.extend(new)
+    return result
+
+
+def mounts(proc):
+    table = {}
+    for line in (read_file(os.path.join(proc, 'mounts')) or '').splitlines():
+        fields = line.split()
+        if len(fields) >= 4:
+            table[fields[1].replace('\\040', ' ')] = (fields[2], fields[3])
+    return table
+
+
+def mount_of(table, path):
+    path = os.path.realpath(path)
+    while True:
+        if path in table:
+            return path, table[path]
+        if path == '/':
+            return path, ('', '')
+        path = os.path.dirname(path)
+
+
+def validate(module, settings, result):
+    params = module.params
+    lens = read_file(params['lens'])
+    if lens is not None:
+        known = dict((key, kind) for kind, key in LENS_RE.findall(lens))
+        for key, value in settings.items():
+            if key not in known:
+                module.fail_json(msg='%s is not a setting of the installed libvirt (%s)' % (key, params['lens']))
+            kind = known[key]
+            if value is None:
+                continue
+            if kind in ('int', 'bool') and not isinstance(value, int):
+                module.fail_json(msg='%s must be an integer, got %r' % (key, value))
+            if kind == 'bool' and value not in (0, 1):
+                module.fail_json(msg='%s must be 0 or 1, got %r' % (key, value))
+            if kind == 'str' and not isinstance(value, str):
+                module.fail_json(msg='%s must be a string, got %r' % (key, value))
+            if kind == 'str_array' and not isinstance(value, (str, list)):
+                module.fail_json(msg='%s must be a string or a list, got %r' % (key, value))
+
+    table = mounts(params['proc'])
+    hugetlbfs = settings.get('hugetlbfs_mount')
+    for path in [hugetlbfs] if isinstance(hugetlbfs, str) else hugetlbfs or []:
+        fstype, options = table.get(path, ('', ''))
+        if fstype != 'hugetlbfs':
+            if module.check_mode:
+                continue
+            module.fail_json(msg='hugetlbfs_mount %s is not a mounted hugetlbfs' % path)
+        pagesize = [option.split('=', 1)[1] for option in options.split(',') if option.startswith('pagesize=')]
+        result['hugetlbfs'].append(dict(path=path, pagesize=pagesize[0] if pagesize else 'default'))
+
+    backing = settings.get('memory_backing_dir')
+    if backing and (os.path.isdir(backing) or not module.check_mode):
+        if not os.path.isdir(backing):
+            module.fail_json(msg='memory_backing_dir %s does not exist' % backing)
+        mountpoint, (fstype, dummy) = mount_of(table, backing)
+        if fstype not in ('tmpfs', 'hugetlbfs'):
+            module.warn('memory_backing_dir %s is on %s (%s); file-backed guest memory is written to disk'
+                        % (backing, fstype or 'an unknown file system', mountpoint))
+
+    nr_open = read_file(os.path.join(params['proc'], 'sys/fs/nr_open'))
+    max_files = settings.get('max_files')
+    if isinstance(max_files, int) and nr_open and max_files > int(nr_open):
+        module.fail_json(msg='max_files %d is above fs.nr_open %s' % (max_files, nr_open.strip()))
+
+
+def qemu_version(module):
+    for path in QEMU_BINARIES:
+        if os.access(path, os.X_OK):
+            rc, out, err = module.run_command([path, '--version'])
+            match = QEMU_VERSION_RE.search(out)
+            return dict(path=path, version=match.group(1) if match else None)
+    return {}
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            settings=dict(type='dict', required=True),
+            path=dict(type='path', default='/etc/libvirt/qemu.conf'),
+            validate=dict(type='bool', default=True),
+            lens=dict(type='path', default='/usr/share/augeas/lenses/libvirtd_qemu.aug'),
+            proc=dict(type='path', default='/proc'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    settings = dict((key, normalize(value)) for key, value in params['settings'].items())
+    result = dict(changed=False, updated=[], removed=[], hugetlbfs=[], qemu=qemu_version(module))
+    if params['validate']:
+        validate(module, settings, result)
+
+    before = read_file(params['path'])
+    if before is None:
+        module.fail_json(msg='%s does not exist; is libvirt installed?' % params['path'], **result)
+    lines = before.splitlines()
+    try:
+        current = effective(lines)
+    except ValueError as e:
+        module.fail_json(msg='Cannot parse %s: %s' % (params['path'], e), **result)
+
+    for key, value in sorted(settings.items()):
+        if value is None and key in current:
+            result['removed'].append(key)
+        elif value is not None and current.get(key) != value:
+            result['updated'].append(key)
+    result['settings'] = settings
+    result['changed'] = bool(result['updated'] or result['removed'])
+    if not result['changed']:
+        module.exit_json(**result)
+
+    after = '\n'.join(update(lines, settings)) + '\n'
+    if module._diff:
+        result['diff'] = dict(before_header=params['path'], before=before,
+                              after_header=params['path'], after=after)
+    if not module.check_mode:
+        fd, tmp = tempfile.mkstemp(dir=module.tmpdir)
+        with os.fdopen(fd, 'w') as f:
+            f.write(after)
+        module.atomic_move(tmp, params['path'])
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: sysctl_profile
+short_description: Resolve a sysctl workload profile and role settings into one drop-in
+description:
+  - Starts from a named workload profile, adds the settings every role requested and the
+    inventory overrides, in that order, and writes the result to a single C(sysctl.d) drop-in,
+    loaded with one C(sysctl -p) run.
+  - Dirty page thresholds of the profiles are set in bytes, as a share of host memory capped
+    at a fixed size, instead of ratios that grow with the amount of RAM.
+  - Conflicts are reported, not silently resolved by ordering. A conflict is a key set to
+    different values by two requests, a contradiction in the result such as C(vm.dirty_ratio)
+    and C(vm.dirty_bytes) from the same source or a background threshold at or above the
+    blocking one, or a key that a file loaded after the drop-in at boot sets to another value.
+    Overrides settle conflicts between requests; contradictions within the overrides are reported.
+  - Roles collect their settings with O(apply=false), which only merges the request into the
+    C(kvmhost_sysctl_requests) fact. A single handler then writes and loads the drop-in.
+version_added: "0.11.0"
+options:
+  profile:
+    description:
+      - Workload profile the settings start from.
+      - C(density) keeps dirty data and page cache small for many overcommitted guests.
+      - C(throughput) allows larger writeback batches for fewer, busier guests.
+      - C(latency) keeps writeback short and turns off automatic NUMA balancing for pinned guests.
+      - C(none) starts from no settings.
+    type: str
+    choices: [density, throughput, latency, none]
+    default: throughput
+  swap:
+    description:
+      - Swap the host uses. With C(zram), swapping out compresses pages in memory, so the
+        profile raises C(vm.swappiness) above 100 where the kernel allows it and turns off swap readahead.
+    type: str
+    choices: [disk, zram]
+    default: disk
+  source:
+    description:
+      - Name of the requester of O(settings), usually the role. A later request of the same
+        source replaces the earlier one.
+    type: str
+  settings:
+    description:
+      - Settings of this request, as sysctl key and value.
+    type: dict
+    default: {}
+  requests:
+    description:
+      - Requests collected so far, in the format of the C(kvmhost_sysctl_requests) fact.
+    type: list
+    elements: dict
+    default: []
+  overrides:
+    description:
+      - Settings from the inventory. They are applied last and win over the profile and the requests.
+    type: dict
+    default: {}
+  on_conflict:
+    description:
+      - Whether conflicts are reported as warnings or fail the task. Only used with O(apply=true).
+    type: str
+    choices: [warn, fail]
+    default: warn
+  apply:
+    description:
+      - Whether to write and load the drop-in.
+      - When false, only the fact is set. RV(changed) then tells whether the settings of O(source)
+        differ from the drop-in or the running kernel, or whether the drop-in still holds keys
+        O(source) no longer requests. The profile and overrides are only known to the final apply.
+    type: bool
+    default: true
+  path:
+    description:
+      - Drop-in that holds the resolved settings.
+    type: path
+    default: /etc/sysctl.d/90-qubinode-sysctl.conf
+  proc:
+    description:
+      - Mount point of procfs.
+    type: path
+    default: /proc
+notes:
+  - Supports check mode and diff mode.
+  - Keys missing from C(/proc/sys), such as C(net.bridge) keys before C(br_netfilter) is loaded,
+    are written but skipped when loading.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Request network sysctls
+  tosin2013.qubinode_kvmhost_setup_collection.sysctl_profile:
+    source: kvmhost_setup
+    settings:
+      net.core.netdev_max_backlog: 5000
+    requests: "{{ kvmhost_sysctl_requests | default([]) }}"
+    apply: false
+  notify: apply sysctl profile
+
+- name: Apply the latency profile with collected requests
+  tosin2013.qubinode_kvmhost_setup_collection.sysctl_profile:
+    profile: latency
+    requests: "{{ kvmhost_sysctl_requests | default([]) }}"
+    overrides:
+      vm.swappiness: 5
+    on_conflict: fail
+'''
+
+RETURN = r'''
+settings:
+  description: Resolved settings written to the drop-in.
+  returned: always
+  type: dict
+  sample: {"vm.dirty_bytes": "1717986918", "vm.swappiness": "10"}
+sources:
+  description: Source of each resolved setting.
+  returned: always
+  type: dict
+  sample: {"vm.dirty_bytes": "profile throughput", "vm.swappiness": "overrides"}
+conflicts:
+  description: Conflicts found while resolving the settings.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    key:
+      description: Key in conflict.
+      type: str
+    values:
+      description: Values set for the key, with their source, in the order they were applied.
+      type: list
+      elements: dict
+    resolved:
+      description: Value the drop-in holds.
+      type: str
+    reason:
+      description: What the conflict is.
+      type: str
+missing:
+  description: Resolved keys the running kernel does not have.
+  returned: always
+  type: list
+  elements: str
+drift:
+  description: Keys whose running value differed from the resolved value before the task.
+  returned: always
+  type: list
+  elements: str
+memtotal_mb:
+  description: Host memory the dirty thresholds were scaled to.
+  returned: always
+  type: int
+ansible_facts:
+  description: The collected requests, for later requests and the final apply.
+  returned: always
+  type: dict
+  contains:
+    kvmhost_sysctl_requests:
+      description: Requests as a list of dicts with C(source) and C(settings).
+      type: list
+      elements: dict
+'''
+
+import os
+import re
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+MIB = 1024 * 1024
+GIB = 1024 * MIB
+MEMTOTAL_RE = re.compile(r'MemTotal:\s+(\d+) kB')
+
+# Dirty thresholds are share of memory in percent, capped, with a floor for small hosts:
+# (background percent, background cap, blocking percent, blocking cap)
+PROFILES = {
+    'density': dict(
+        dirty=(1, 256 * MIB, 3, 1 * GIB),
+        settings={
+            'vm.swappiness': 10,
+            'vm.vfs_cache_pressure': 100,
+            'vm.dirty_writeback_centisecs': 500,
+            'vm.dirty_expire_centisecs': 3000,
+        },
+    ),
+    'throughput': dict(
+        dirty=(5, 1 * GIB, 10, 4 * GIB),
+        settings={
+            'vm.swappiness': 10,
+            'vm.vfs_cache_pressure': 50,
+            'vm.dirty_writeback_centisecs': 500,
+            'vm.dirty_expire_centisecs': 3000,
+        },
+    ),
+    'latency': dict(
+        dirty=(1, 128 * MIB, 2, 512 * MIB),
+        settings={
+            'vm.swappiness': 1,
+            'vm.vfs_cache_pressure': 50,
+            'vm.dirty_writeback_centisecs': 100,
+            'vm.dirty_expire_centisecs': 1000,
+            # Pinned guests have their memory bound already; balancing only adds page migrations
+            'kernel.numa_balancing': 0,
+            # Fewer vmstat updates on isolated CPUs
+            'vm.stat_interval': 10,
+        },
+    ),
+    'none': dict(dirty=None, settings={}),
+}
+# Swappiness is the cost of file I/O relative to swap I/O, 100 meaning equal. zram swap is
+# several times cheaper than reading the page cache back from disk; latency keeps it at par
+# so pinned guests are not swapped out before the page cache shrinks.
+ZRAM_SWAPPINESS = {'density': 180, 'throughput': 150, 'latency': 100}
+# Kernels before 5.8 cap vm.swappiness at 100
+SWAPPINESS_200 = (5, 8)
+DIRTY_FLOOR = (16 * MIB, 64 * MIB)
+
+# Writing one form of a threshold makes the kernel zero the other
+EXCLUSIVE = {
+    'vm.dirty_ratio': 'vm.dirty_bytes',
+    'vm.dirty_bytes': 'vm.dirty_ratio',
+    'vm.dirty_background_ratio': 'vm.dirty_background_bytes',
+    'vm.dirty_background_bytes': 'vm.dirty_background_ratio',
+}
+DEFAULT_LIMITS = (('net.core.rmem_default', 'net.core.rmem_max'), ('net.core.wmem_default', 'net.core.wmem_max'))
+
+# systemd-sysctl reads these directories, a file name in an earlier one hiding the later ones
+SYSCTL_DIRS = ('/etc/sysctl.d', '/run/sysctl.d', '/usr/local/lib/sysctl.d', '/usr/lib/sysctl.d')
+SYSCTL_CONF = '/etc/sysctl.conf'
+
+
+def normalize(value):
+    if isinstance(value, bool):
+        value = int(value)
+    return ' '.join(str(value).split())
+
+
+def proc_path(proc, key):
+    # Keys with a slash use it as separator, so dots in interface names stay literal
+    return os.path.join(proc, 'sys', key if '/' in key else key.replace('.', '/'))
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def memtotal(proc):
+    match = MEMTOTAL_RE.search(read_file(os.path.join(proc, 'meminfo')) or '')
+    return int(match.group(1)) * 1024 if match else 0
+
+
+def kernel_version(proc):
+    match = re.match(r'(\d+)\.(\d+)', read_file(os.path.join(proc, 'sys/kernel/osrelease')) or '')
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+def profile_settings(name, memory, swap='disk', kernel=(0, 0)):
+    profile = PROFILES[name]
+    settings = dict((key, normalize(value)) for key, value in profile['settings'].items())
+    if swap == 'zram' and name in ZRAM_SWAPPINESS:
+        swappiness = ZRAM_SWAPPINESS[name] if kernel >= SWAPPINESS_200 else 100
+        settings['vm.swappiness'] = str(swappiness)
+        # Compressed pages are read one at a time; readahead only decompresses pages nobody asked for
+        settings['vm.page-cluster'] = '0'
+    if profile['dirty'] and memory:
+        background_percent, background_cap, percent, cap = profile['dirty']
+        background = max(min(memory * background_percent // 100, background_cap), DIRTY_FLOOR[0])
+        settings['vm.dirty_background_bytes'] = str(background)
+        settings['vm.dirty_bytes'] = str(max(min(memory * percent // 100, cap), DIRTY_FLOOR[1], 2 * background))
+    return settings
+
+
+def parse_sysctl(text):
+    settings = {}
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or line[0] in '#;' or '=' not in line:
+            continue
+        key, dummy, value = line.partition('=')
+        settings[key.strip().lstrip('-')] = normalize(value)
+    return settings
+
+
+def section_keys(text, source):
+    """Keys render() wrote under the comment line of source."""
+    keys, current = [], None
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if line.startswith('#'):
+            current = line[1:].strip()
+        elif line and current == source:
+            keys.extend(parse_sysctl(line))
+    return keys
+
+
+def request_changed(settings, source, text, proc):
+    """Whether applying would change what the request of source asks for."""
+    written = parse_sysctl(text)
+    for key, value in settings.items():
+        running = read_file(proc_path(proc, key))
+        if written.get(key) != value or (running is not None and normalize(running) != value):
+            return True
+    return bool(set(section_keys(text, source)) - set(settings))
+
+
+def later_files(path):
+    """sysctl files systemd-sysctl applies after path at boot."""
+    name = os.path.basename(path)
+    files = {}
+    for directory in SYSCTL_DIRS:
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.endswith('.conf') and entry not in files:
+                files[entry] = os.path.join(directory, entry)
+    later = [files[entry] for entry in sorted(files) if entry > name]
+    return later + [SYSCTL_CONF]
+
+
+def conflict(key, values, resolved, reason):
+    return dict(key=key, values=values, resolved=resolved, reason=reason)
+
+
+def resolve(layers, memory):
+    """Merge layers of (source, settings) in order; return settings, sources and conflicts.
+
+    The first layer is the profile and the last one the overrides. A request that differs
+    from the profile or another request is a conflict; an override is not.
+    """
+    settings, sources, history, conflicts = {}, {}, {}, []
+    profile_source = layers[0][0]
+    for source, layer in layers:
+        for key in sorted(layer):
+            value = normalize(layer[key])
+            pair = EXCLUSIVE.get(key)
+            if pair in layer and key.endswith('_ratio'):
+                conflicts.append(conflict(
+                    key, [dict(source=source, value=value), dict(source=source, value=normalize(layer[pair]))],
+                    normalize(layer[pair]),
+                    '%s sets both %s and %s; the kernel keeps only the last one written, %s is used'
+                    % (source, key, pair, pair)))
+                continue
+            if pair in settings:
+                if source != 'overrides' and sources[pair] != source and sources[pair] != profile_source:
+                    conflicts.append(conflict(
+                        key, [dict(source=sources[pair], value=settings[pair]), dict(source=source, value=value)],
+                        value, '%s from %s replaces %s from %s' % (key, source, pair, sources[pair])))
+                del settings[pair]
+                del sources[pair]
+                history.pop(pair, None)
+            history.setdefault(key, []).append(dict(source=source, value=value))
+            settings[key] = value
+            sources[key] = source
+
+    for key, values in sorted(history.items()):
+        if sources[key] == 'overrides':
+            continue
+        if len(set(item['value'] for item in values)) > 1:
+            conflicts.append(conflict(key, values, settings[key], 'set to different values; %s wins' % sources[key]))
+
+    def as_bytes(name):
+        if 'vm.%s_bytes' % name in settings:
+            return int(settings['vm.%s_bytes' % name])
+        if 'vm.%s_ratio' % name in settings:
+            return memory * int(settings['vm.%s_ratio' % name]) // 100
+        return None
+
+    try:
+        background, blocking = as_bytes('dirty_background'), as_bytes('dirty')
+        if background is not None and blocking is not None and background >= blocking:
+            conflicts.append(conflict(
+                'vm.dirty_background', [dict(source='resolved', value=str(background)),
+                                        dict(source='resolved', value=str(blocking))],
+                '', 'the background writeback threshold (%d MiB) is not below the blocking threshold (%d MiB)'
+                % (background // MIB, blocking // MIB)))
+        for default, limit in DEFAULT_LIMITS:
+            if default in settings and limit in settings and int(settings[default]) > int(settings[limit]):
+                conflicts.append(conflict(
+                    default, [dict(source=sources[default], value=settings[default]),
+                              dict(source=sources[limit], value=settings[limit])],
+                    settings[default], '%s is above %s' % (default, limit)))
+    except ValueError:
+        pass
+    return settings, sources, conflicts
+
+
+def render(profile, settings, sources, order):
+    lines = ['# Managed by Ansible (sysctl_profile), profile %s' % profile,
+             '# Changes are overwritten; set overrides in the inventory instead']
+    for source in order:
+        keys = sorted(key for key in settings if sources[key] == source)
+        if keys:
+            lines.extend(['', '# %s' % source])
+            lines.extend('%s = %s' % (key, settings[key]) for key in keys)
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            profile=dict(type='str', choices=sorted(PROFILES), default='throughput'),
+            swap=dict(type='str', choices=['disk', 'zram'], default='disk'),
+            source=dict(type='str'),
+            settings=dict(type='dict', default={}),
+            requests=dict(type='list', elements='dict', default=[]),
+            overrides=dict(type='dict', default={}),
+            on_conflict=dict(type='str', choices=['warn', 'fail'], default='warn'),
+            apply=dict(type='bool', default=True),
+            path=dict(type='path', default='/etc/sysctl.d/90-qubinode-sysctl.conf'),
+            proc=dict(type='path', default='/proc'),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    if params['settings'] and not params['source']:
+        module.fail_json(msg='source is required with settings')
+    requests = []
+    for request in params['requests']:
+        if not isinstance(request.get('settings'), dict) or not request.get('source'):
+            module.fail_json(msg='requests must be dicts with source and settings: %s' % request)
+        requests.append(dict(source=request['source'], settings=request['settings']))
+    if params['source']:
+        request = dict(source=params['source'], settings=params['settings'])
+        positions = [i for i, item in enumerate(requests) if item['source'] == params['source']]
+        if positions:
+            requests[positions[0]] = request
+        else:
+            requests.append(request)
+
+    memory = memtotal(params['proc'])
+    profile = params['profile'] + (' with zram swap' if params['swap'] == 'zram' else '')
+    profile_source = 'profile %s' % profile
+    kernel = kernel_version(params['proc'])
+    layers = [(profile_source, profile_settings(params['profile'], memory, params['swap'], kernel))]
+    layers.extend((request['source'], request['settings']) for request in requests)
+    layers.append(('overrides', params['overrides']))
+    settings, sources, conflicts = resolve(layers, memory)
+    content = render(profile, settings, sources, [source for source, dummy in layers])
+
+    for path in later_files(params['path']):
+        for key, value in parse_sysctl(read_file(path)).items():
+            if key in settings and value != settings[key]:
+                conflicts.append(conflict(
+                    key, [dict(source=sources[key], value=settings[key]), dict(source=path, value=value)],
+                    value, '%s sets %s and is applied after %s at boot' % (path, value, params['path'])))
+
+    running = dict((key, read_file(proc_path(params['proc'], key))) for key in settings)
+    missing = sorted(key for key, value in running.items() if value is None)
+    drift = sorted(key for key, value in running.items() if value is not None and normalize(value) != settings[key])
+    before = read_file(params['path'])
+    if params['apply']:
+        changed = before != content or bool(drift)
+    else:
+        # Requests are made without the profile and overrides, so the rendered content is
+        # incomplete; only the keys of this request are compared
+        changed = bool(params['source']) and request_changed(
+            dict((key, normalize(value)) for key, value in params['settings'].items()),
+            params['source'], before, params['proc'])
+    result = dict(
+        changed=changed,
+        settings=settings,
+        sources=sources,
+        conflicts=conflicts,
+        missing=missing,
+        drift=drift,
+        memtotal_mb=memory // MIB,
+        ansible_facts=dict(kvmhost_sysctl_requests=requests),
+    )
+    if module._diff and params['apply'] and before != content:
+        result['diff'] = dict(before_header=params['path'], before=before or '',
+                              after_header=params['path'], after=content)
+
+    if not params['apply']:
+        module.exit_json(**result)
+    if conflicts:
+        messages = ['%s: %s' % (item['key'], item['reason']) for item in conflicts]
+        if params['on_conflict'] == 'fail':
+            module.fail_json(msg='sysctl conflicts: %s' % '; '.join(messages), **result)
+        for message in messages:
+            module.warn('sysctl conflict, %s' % message)
+    if not result['changed'] or module.check_mode:
+        module.exit_json(**result)
+
+    if before != content:
+        fd, tmp = tempfile.mkstemp(dir=module.tmpdir)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        module.atomic_move(tmp, params['path'])
+        os.chmod(params['path'], 0o644)
+    # -e skips keys of modules that are not loaded; one run loads the whole drop-in
+    rc, out, err = module.run_command([module.get_bin_path('sysctl', required=True), '-e', '-p', params['path']])
+    if rc != 0:
+        module.fail_json(msg='sysctl -p %s failed: %s' % (params['path'], err.strip() or out.strip()), **result)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
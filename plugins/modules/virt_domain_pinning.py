@@ -0,0 +1,384 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: virt_domain_pinning
+short_description: Pin guest vCPUs, emulator and I/O threads and bind guest memory to a NUMA node
+description:
+  - Places each guest on one NUMA node and gives it guest CPUs of that node that no other guest
+    holds, whole SMT cores first. Emulator and I/O threads are pinned to the node's housekeeping
+    CPUs, and guest memory is bound to the node.
+  - Allocations are kept in O(state_file). Guests keep their CPUs across runs, so adding a guest
+    only allocates CPUs for it and never repins the others. CPUs of guests that no longer exist
+    are released.
+  - Guests that do not exist yet can be planned from their size; their CPUs are reserved and
+    pinned once the domain is defined.
+  - Pinning is changed through the libvirt API in the persistent definition and, for running
+    guests, live. Only the memory policy mode of a running guest cannot change live; it takes
+    effect at the next guest start.
+version_added: "0.11.0"
+options:
+  uri:
+    description:
+      - libvirt connection URI.
+    type: str
+    default: qemu:///system
+  guests:
+    description:
+      - Guests to place.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description: Domain name.
+        type: str
+        required: true
+      vcpus:
+        description:
+          - Number of vCPUs. Defaults to the C(<vcpu>) count of the domain; required for guests
+            that are not defined yet.
+        type: int
+      node:
+        description: NUMA node to place the guest on. By default the node whose free guest CPUs fit best.
+        type: int
+  partition:
+    description:
+      - Host CPU partition as set in the C(kvmhost_cpu_partition) fact by the cpu_partition module,
+        with C(nodes) holding the C(housekeeping) and C(guest) cpulist of each node.
+    type: dict
+    required: true
+  memory_mode:
+    description:
+      - NUMA memory policy of the guests.
+    type: str
+    choices: [strict, preferred, interleave, restrictive]
+    default: strict
+  live:
+    description:
+      - Also change running guests. When false only the persistent definitions change.
+    type: bool
+    default: true
+  state_file:
+    description:
+      - File recording the CPU allocation of every guest.
+    type: path
+    default: /var/lib/qubinode/cpu-pinning.json
+  sysfs:
+    description:
+      - Mount point of sysfs, read for the SMT siblings of each CPU.
+    type: path
+    default: /sys
+requirements:
+  - libvirt-python
+notes:
+  - Supports check mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Partition host CPUs
+  tosin2013.qubinode_kvmhost_setup_collection.cpu_partition:
+    housekeeping_cores: 1
+
+- name: Pin guests to isolated CPUs
+  tosin2013.qubinode_kvmhost_setup_collection.virt_domain_pinning:
+    partition: "{{ kvmhost_cpu_partition }}"
+    guests:
+      - name: ocp-master-0
+      - name: ocp-master-1
+      - name: idm
+        vcpus: 2
+        node: 0
+  register: pinning
+'''
+
+RETURN = r'''
+allocations:
+  description: Placement of each guest in O(guests).
+  returned: always
+  type: dict
+  sample:
+    idm:
+      node: 0
+      cpus: 2-3
+      vcpupin: ["2", "3"]
+      emulator: 0,16
+      memory_nodes: "0"
+      cputune_xml: <cputune><vcpupin vcpu="0" cpuset="2" />...</cputune>
+      numatune_xml: <numatune><memory mode="strict" nodeset="0" /></numatune>
+      defined: true
+      actions: [vcpupin_config, vcpupin_live]
+      restart_required: false
+released:
+  description:
+    - Guests whose CPUs were released, because the domain no longer exists or its CPUs are no
+      longer guest CPUs of its node.
+  returned: always
+  type: list
+  elements: str
+free:
+  description: Guest CPUs of each node that no guest holds, as cpulists keyed by node.
+  returned: always
+  type: dict
+'''
+
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.cpulist import (
+    cpu_topology,
+    format_cpulist,
+    parse_cpulist,
+)
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.virt import (
+    LIBVIRT_ARGUMENT_SPEC,
+    connect,
+    libvirt,
+    lookup,
+    parse_xml,
+)
+
+# virDomainNumatuneMemMode values
+MEMORY_MODES = dict(strict=0, preferred=1, interleave=2, restrictive=3)
+AFFECT_LIVE = 1
+AFFECT_CONFIG = 2
+
+
+def load_record(module, path):
+    try:
+        with open(path) as f:
+            return json.load(f).get('domains', {})
+    except (IOError, OSError):
+        return {}
+    except ValueError as e:
+        module.fail_json(msg='Cannot parse %s: %s' % (path, e))
+
+
+def save_record(module, path, record):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o755)
+    fd, tmp = tempfile.mkstemp(dir=module.tmpdir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(dict(domains=record), f, indent=2, sort_keys=True)
+        f.write('\n')
+    module.atomic_move(tmp, path)
+
+
+def domain_vcpus(module, dom, name):
+    flags = libvirt.VIR_DOMAIN_XML_INACTIVE if dom.isPersistent() else 0
+    vcpu = parse_xml(module, dom.XMLDesc(flags), 'domain %s' % name).find('vcpu')
+    return int(vcpu.text) if vcpu is not None else 1
+
+
+def pick_cpus(topology, free, count):
+    """Take count CPUs from free, whole SMT cores first so guests do not share cores."""
+    cores = {}
+    for cpu in free:
+        cores.setdefault(topology[cpu]['core'] if cpu in topology else cpu, []).append(cpu)
+    whole = [cpus for core, cpus in sorted(cores.items())
+             if len(cpus) == len(topology.get(core, {}).get('siblings', [core]))]
+    partial = [cpus for core, cpus in sorted(cores.items()) if cpus not in whole]
+    picked = []
+    for cpus in whole + partial:
+        picked.extend(sorted(cpus)[:count - len(picked)])
+        if len(picked) == count:
+            break
+    return picked
+
+
+def cpumap(cpus, ncpus):
+    return tuple(cpu in cpus for cpu in range(ncpus))
+
+
+def desired_state(allocation, node_housekeeping, mode):
+    vcpupin = [str(cpu) for cpu in allocation['vcpus']]
+    emulator = node_housekeeping[allocation['node']]
+    cputune = ET.Element('cputune')
+    for index, cpu in enumerate(vcpupin):
+        ET.SubElement(cputune, 'vcpupin', vcpu=str(index), cpuset=cpu)
+    ET.SubElement(cputune, 'emulatorpin', cpuset=emulator)
+    numatune = ET.Element('numatune')
+    ET.SubElement(numatune, 'memory', mode=mode, nodeset=str(allocation['node']))
+    return dict(
+        node=allocation['node'],
+        cpus=format_cpulist(allocation['vcpus']),
+        vcpupin=vcpupin,
+        emulator=emulator,
+        memory_nodes=str(allocation['node']),
+        cputune_xml=ET.tostring(cputune, encoding='unicode'),
+        numatune_xml=ET.tostring(numatune, encoding='unicode'),
+    )
+
+
+def apply_pinning(module, dom, state, ncpus, report):
+    """Pin dom to state in its persistent definition and, when running, live."""
+    views = []
+    if dom.isPersistent():
+        views.append((AFFECT_CONFIG, 'config'))
+    if dom.isActive() and module.params['live']:
+        views.append((AFFECT_LIVE, 'live'))
+    emulator = cpumap(parse_cpulist(state['emulator']), ncpus)
+    mode = MEMORY_MODES[module.params['memory_mode']]
+
+    for flag, view in views:
+        current = dom.vcpuPinInfo(flag)
+        wanted = [cpumap([int(cpu)], ncpus) for cpu in state['vcpupin']]
+        pins = [(vcpu, want) for vcpu, want in enumerate(wanted[:len(current)]) if tuple(current[vcpu][:ncpus]) != want]
+        if pins:
+            report['actions'].append('vcpupin_%s' % view)
+            if not module.check_mode:
+                for vcpu, want in pins:
+                    dom.pinVcpuFlags(vcpu, want, flag)
+
+        if tuple(dom.emulatorPinInfo(flag)[:ncpus]) != emulator:
+            report['actions'].append('emulatorpin_%s' % view)
+            if not module.check_mode:
+                dom.pinEmulator(emulator, flag)
+
+        iothreads = [(thread[0], tuple(thread[1][:ncpus])) for thread in dom.ioThreadInfo(flag)]
+        if any(threadmap != emulator for dummy, threadmap in iothreads):
+            report['actions'].append('iothreadpin_%s' % view)
+            if not module.check_mode:
+                for thread_id, threadmap in iothreads:
+                    if threadmap != emulator:
+                        dom.pinIOThread(thread_id, emulator, flag)
+
+        numa = dom.numaParameters(flag)
+        params = {}
+        if numa.get('numa_nodeset') != state['memory_nodes']:
+            params['numa_nodeset'] = state['memory_nodes']
+        if numa.get('numa_mode') != mode:
+            if flag == AFFECT_LIVE:
+                report['restart_required'] = True
+            else:
+                params['numa_mode'] = mode
+        if params:
+            report['actions'].append('numatune_%s' % view)
+            if not module.check_mode:
+                dom.setNumaParameters(params, flag)
+
+
+def main():
+    argument_spec = dict(
+        guests=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                vcpus=dict(type='int'),
+                node=dict(type='int'),
+            ),
+        ),
+        partition=dict(type='dict', required=True),
+        memory_mode=dict(type='str', choices=list(MEMORY_MODES), default='strict'),
+        live=dict(type='bool', default=True),
+        state_file=dict(type='path', default='/var/lib/qubinode/cpu-pinning.json'),
+        sysfs=dict(type='path', default='/sys'),
+    )
+    argument_spec.update(LIBVIRT_ARGUMENT_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+    params = module.params
+
+    node_guest, node_housekeeping = {}, {}
+    for node in params['partition'].get('nodes') or []:
+        node_guest[int(node['node'])] = set(parse_cpulist(node.get('guest')))
+        node_housekeeping[int(node['node'])] = node.get('housekeeping') or params['partition'].get('housekeeping', '')
+    if not any(node_guest.values()):
+        module.fail_json(msg='The CPU partition has no guest CPUs; run cpu_partition first')
+    topology = cpu_topology(params['sysfs'])
+
+    names = [guest['name'] for guest in params['guests']]
+    if len(set(names)) != len(names):
+        module.fail_json(msg='Guests are listed more than once: %s'
+                         % ', '.join(sorted(set(name for name in names if names.count(name) > 1))))
+
+    conn = connect(module)
+    result = dict(changed=False, allocations={}, released=[], free={})
+    try:
+        ncpus = conn.getCPUMap(0)[0]
+        record = load_record(module, params['state_file'])
+        requested = dict((guest['name'], guest) for guest in params['guests'])
+        domains = dict((name, lookup(conn.lookupByName, name, libvirt.VIR_ERR_NO_DOMAIN))
+                       for name in set(record) | set(requested))
+
+        # Sizes first: they decide which recorded allocations still fit
+        sizes = {}
+        for name, guest in requested.items():
+            dom = domains[name]
+            if dom is None and guest['vcpus'] is None:
+                module.fail_json(msg='Guest %s is not defined; give its vcpus to plan it' % name)
+            sizes[name] = guest['vcpus'] or domain_vcpus(module, dom, name)
+            if dom is not None and guest['vcpus'] and guest['vcpus'] != domain_vcpus(module, dom, name):
+                module.fail_json(msg='Guest %s has %d vCPUs, not %d'
+                                 % (name, domain_vcpus(module, dom, name), guest['vcpus']))
+            if guest['node'] is not None and guest['node'] not in node_guest:
+                module.fail_json(msg='Guest %s: node %d has no guest CPUs' % (name, guest['node']))
+
+        kept, used = {}, set()
+        for name, allocation in sorted(record.items()):
+            if domains.get(name) is None and name not in requested:
+                result['released'].append(name)
+                continue
+            cpus = allocation.get('vcpus', [])
+            guest = requested.get(name)
+            fits = (allocation.get('node') in node_guest and set(cpus) <= node_guest[allocation['node']]
+                    and not used & set(cpus))
+            if guest is not None:
+                fits = fits and len(cpus) == sizes[name] and guest['node'] in (None, allocation['node'])
+            if fits:
+                kept[name] = allocation
+                used |= set(cpus)
+            elif guest is None:
+                # Left pinned where it is, but its CPUs no longer count as held
+                result['released'].append(name)
+
+        # Largest guests first, so small ones fill what is left
+        for name in sorted((name for name in requested if name not in kept), key=lambda name: (-sizes[name], name)):
+            free = dict((node, cpus - used) for node, cpus in node_guest.items())
+            candidates = [requested[name]['node']] if requested[name]['node'] is not None else sorted(free)
+            candidates = [node for node in candidates if len(free[node]) >= sizes[name]]
+            if not candidates:
+                module.fail_json(msg='No NUMA node has %d free guest CPUs for %s; free per node: %s'
+                                 % (sizes[name], name, ', '.join('%d: %d' % (node, len(cpus))
+                                                                for node, cpus in sorted(free.items()))), **result)
+            node = min(candidates, key=lambda node: (len(free[node]), node))
+            kept[name] = dict(node=node, vcpus=pick_cpus(topology, free[node], sizes[name]))
+            used |= set(kept[name]['vcpus'])
+
+        for name in sorted(requested):
+            state = desired_state(kept[name], node_housekeeping, params['memory_mode'])
+            report = dict(state, defined=domains[name] is not None, actions=[], restart_required=False)
+            if record.get(name) != kept[name]:
+                report['actions'].append('allocated')
+            if domains[name] is not None:
+                apply_pinning(module, domains[name], state, ncpus, report)
+            result['allocations'][name] = report
+            result['changed'] = result['changed'] or bool(report['actions'])
+
+        result['free'] = dict((str(node), format_cpulist(cpus - used)) for node, cpus in sorted(node_guest.items()))
+        if kept != record:
+            result['changed'] = True
+            if not module.check_mode:
+                save_record(module, params['state_file'], kept)
+    except libvirt.libvirtError as e:
+        module.fail_json(msg='libvirt error pinning guests: %s' % e, **result)
+    finally:
+        conn.close()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
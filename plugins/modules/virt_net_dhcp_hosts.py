@@ -0,0 +1,328 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: virt_net_dhcp_hosts
+short_description: Manage DHCP reservations of a libvirt network without redefining it
+description:
+  - Compares a list of DHCP reservations with the C(<host>) entries of a libvirt network and
+    applies only the difference with C(virsh net-update) style calls, so adding or removing a
+    reservation never redefines or restarts the network.
+  - Every call updates the running network and its persistent definition together. dnsmasq
+    rereads its hosts file on each call; guests keep their leases and connectivity.
+  - The running and the persistent definition are compared separately, so reservations lost from
+    one of them (for example after the network was redefined from a template without them) are
+    restored there only.
+  - All updates for a network are sent over one libvirt connection, removals first so addresses
+    and MAC addresses they free can be reused by the additions.
+version_added: "0.11.0"
+options:
+  uri:
+    description:
+      - libvirt connection URI.
+    type: str
+    default: qemu:///system
+  network:
+    description:
+      - Name of the libvirt network.
+    type: str
+    required: true
+  hosts:
+    description:
+      - Desired reservations. Each is placed in the C(<ip>) element whose subnet contains its address.
+      - A reservation is identified by its MAC address, or by its name when it has no MAC address.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description: Host name handed out with the lease.
+        type: str
+      mac:
+        description: MAC address of the guest interface. Required for IPv4 reservations unless O(hosts[].name) is set.
+        type: str
+      ip:
+        description: Reserved address.
+        type: str
+        required: true
+  purge:
+    description:
+      - Remove reservations of the network that are not in O(hosts).
+    type: bool
+    default: true
+requirements:
+  - libvirt-python
+notes:
+  - Supports check mode and diff mode.
+  - In check mode a network that does not exist yet is reported as receiving every reservation.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+# Reserved addresses must lie outside the DHCP range of the network, here defined with
+# kvmhost_libvirt_networks: [{name: qubinat, mode: nat, dhcp_range: {start: 192.168.100.100, end: 192.168.100.254}}]
+- name: Reserve addresses on the NAT network
+  tosin2013.qubinode_kvmhost_setup_collection.virt_net_dhcp_hosts:
+    network: qubinat
+    hosts:
+      - name: idm
+        mac: "52:54:00:10:00:01"
+        ip: 192.168.100.10
+      - name: bastion
+        mac: "52:54:00:10:00:02"
+        ip: 192.168.100.11
+
+- name: Add a reservation and keep the others
+  tosin2013.qubinode_kvmhost_setup_collection.virt_net_dhcp_hosts:
+    network: qubinat
+    hosts:
+      - name: worker-0
+        mac: "52:54:00:10:00:20"
+        ip: 192.168.100.20
+    purge: false
+'''
+
+RETURN = r'''
+added:
+  description: Reservations that were added.
+  returned: always
+  type: list
+  elements: dict
+modified:
+  description: Reservations whose name or address changed, as they are after the task.
+  returned: always
+  type: list
+  elements: dict
+removed:
+  description: Reservations that were removed.
+  returned: always
+  type: list
+  elements: dict
+updates:
+  description: Number of network update calls made.
+  returned: always
+  type: int
+hosts:
+  description: Reservations of the running network, or of the persistent definition when the network is stopped, after the task.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Host name.
+      type: str
+    mac:
+      description: MAC address.
+      type: str
+    ip:
+      description: Reserved address.
+      type: str
+'''
+
+import ipaddress
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.virt import (
+    LIBVIRT_ARGUMENT_SPEC,
+    connect,
+    libvirt,
+    lookup,
+    parse_xml,
+)
+
+# virNetworkUpdateCommand, virNetworkUpdateSection and virNetworkUpdateFlags values
+UPDATE_MODIFY = 1
+UPDATE_DELETE = 2
+UPDATE_ADD_LAST = 3
+SECTION_IP_DHCP_HOST = 4
+AFFECT_LIVE = 1
+AFFECT_CONFIG = 2
+# Removals run first so the addresses and MAC addresses they free can be reused
+COMMAND_ORDER = (UPDATE_DELETE, UPDATE_MODIFY, UPDATE_ADD_LAST)
+
+
+def host_key(host):
+    return host['mac'] if host.get('mac') else 'name:%s' % host.get('name')
+
+
+def host_xml(host):
+    element = ET.Element('host')
+    for attr in ('mac', 'name', 'ip'):
+        if host.get(attr):
+            element.set(attr, host[attr])
+    return ET.tostring(element, encoding='unicode')
+
+
+def subnets(root):
+    """The ip_network of each <ip> element, indexed as libvirt's parentIndex counts them."""
+    result = []
+    for ip in root.findall('ip'):
+        address = ip.get('address')
+        prefix = ip.get('prefix') or ip.get('netmask') or ('64' if ':' in (address or '') else '24')
+        try:
+            result.append(ipaddress.ip_network(u'%s/%s' % (address, prefix), strict=False))
+        except ValueError:
+            result.append(None)
+    return result
+
+
+def existing_hosts(root):
+    """Map reservation key to (ip index, host) for every <host> of the definition."""
+    hosts = {}
+    for index, ip in enumerate(root.findall('ip')):
+        for element in ip.findall('dhcp/host'):
+            host = dict(name=element.get('name'), mac=(element.get('mac') or '').lower() or None, ip=element.get('ip'))
+            hosts[host_key(host)] = (index, host)
+    return hosts
+
+
+def address_order(host):
+    address = ipaddress.ip_address(u'%s' % host['ip'])
+    return address.version, address
+
+
+def normalize(module, hosts):
+    desired, addresses = {}, {}
+    for host in hosts:
+        host = dict(name=host.get('name'), mac=(host.get('mac') or '').lower() or None, ip=host['ip'])
+        if not host['mac'] and not host['name']:
+            module.fail_json(msg='Reservation for %s needs a mac or a name' % host['ip'])
+        try:
+            address = ipaddress.ip_address(u'%s' % host['ip'])
+        except ValueError:
+            module.fail_json(msg='Reservation %s: invalid address %s' % (host_key(host), host['ip']))
+        key = host_key(host)
+        if key in desired:
+            module.fail_json(msg='Duplicate reservation for %s' % key)
+        if address in addresses:
+            module.fail_json(msg='Address %s is reserved for both %s and %s' % (host['ip'], addresses[address], key))
+        desired[key] = host
+        addresses[address] = key
+    return desired
+
+
+def placement(module, networks, host):
+    address = ipaddress.ip_address(u'%s' % host['ip'])
+    for index, network in enumerate(networks):
+        if network is not None and address in network:
+            return index
+    module.fail_json(msg='Address %s of %s is not in any subnet of the network' % (host['ip'], host_key(host)))
+
+
+def delta(module, root, desired, purge):
+    """Updates that turn the hosts of one definition into desired, as (command, index, key) -> host."""
+    networks = subnets(root)
+    have = existing_hosts(root)
+    ops = {}
+    for key, host in desired.items():
+        index = placement(module, networks, host)
+        if key not in have:
+            ops[(UPDATE_ADD_LAST, index, key)] = host
+            continue
+        have_index, have_host = have[key]
+        if have_index != index:
+            ops[(UPDATE_DELETE, have_index, key)] = have_host
+            ops[(UPDATE_ADD_LAST, index, key)] = host
+        elif (have_host['name'], have_host['ip']) != (host['name'], host['ip']):
+            ops[(UPDATE_MODIFY, index, key)] = host
+    if purge:
+        for key, (index, host) in have.items():
+            if key not in desired:
+                ops[(UPDATE_DELETE, index, key)] = host
+    return ops
+
+
+def main():
+    argument_spec = dict(
+        network=dict(type='str', required=True),
+        hosts=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str'),
+                mac=dict(type='str'),
+                ip=dict(type='str', required=True),
+            ),
+        ),
+        purge=dict(type='bool', default=True),
+    )
+    argument_spec.update(LIBVIRT_ARGUMENT_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+    params = module.params
+    desired = normalize(module, params['hosts'])
+
+    conn = connect(module)
+    result = dict(changed=False, added=[], modified=[], removed=[], updates=0, hosts=[])
+    try:
+        net = lookup(conn.networkLookupByName, params['network'], libvirt.VIR_ERR_NO_NETWORK)
+        if net is None:
+            if not module.check_mode:
+                module.fail_json(msg='Network %s does not exist' % params['network'])
+            result.update(changed=bool(desired), added=list(desired.values()), hosts=list(desired.values()))
+            module.exit_json(**result)
+
+        # Each view is updated only where it differs, so one call can carry both flags
+        views = []
+        if net.isActive():
+            views.append((AFFECT_LIVE, parse_xml(module, net.XMLDesc(0), 'network %s' % params['network'])))
+        if net.isPersistent():
+            views.append((AFFECT_CONFIG, parse_xml(module, net.XMLDesc(libvirt.VIR_NETWORK_XML_INACTIVE),
+                                                   'persistent network %s' % params['network'])))
+        before = existing_hosts(views[0][1])
+
+        flags, hosts = {}, {}
+        for flag, root in views:
+            for op, host in delta(module, root, desired, params['purge']).items():
+                flags[op] = flags.get(op, 0) | flag
+                hosts[op] = host
+        ops = sorted(flags, key=lambda op: COMMAND_ORDER.index(op[0]))
+
+        reported = set()
+        for op in ops:
+            command, index, key = op
+            if not module.check_mode:
+                net.update(command, SECTION_IP_DHCP_HOST, index, host_xml(hosts[op]), flags[op])
+            result['updates'] += 1
+            # A host moved between subnets is a removal and an addition; report it once as modified
+            if key in reported:
+                continue
+            reported.add(key)
+            if command == UPDATE_DELETE and key in desired:
+                result['modified'].append(desired[key])
+            elif command == UPDATE_DELETE:
+                result['removed'].append(hosts[op])
+            elif key in before:
+                result['modified'].append(hosts[op])
+            else:
+                result['added'].append(hosts[op])
+
+        after = dict((key, host) for key, (index, host) in before.items()
+                     if key in desired or not params['purge'])
+        after.update(desired)
+        result['hosts'] = sorted(after.values(), key=address_order)
+        result['changed'] = bool(ops)
+        if module._diff and ops:
+            result['diff'] = dict(
+                before_header=params['network'],
+                before='\n'.join(host_xml(host) for index, host in before.values()) + '\n',
+                after_header=params['network'],
+                after='\n'.join(host_xml(host) for host in result['hosts']) + '\n',
+            )
+    except libvirt.libvirtError as e:
+        module.fail_json(msg='libvirt error updating network %s: %s' % (params['network'], e), **result)
+    finally:
+        conn.close()
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
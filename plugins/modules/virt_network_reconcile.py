@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: virt_network_reconcile
+short_description: Reconcile a list of libvirt networks over a single connection
+description:
+  - Compares each desired network definition with the persistent definition libvirt holds and
+    defines, redefines, starts, stops, autostarts or removes only the networks that differ.
+  - A live definition matches when it contains every element and attribute of the desired XML;
+    values libvirt fills in itself (uuid, mac address, generated defaults) are not treated as drift.
+  - All networks are handled in one task over one libvirt connection, replacing per-network
+    C(virsh net-info) and M(community.libvirt.virt_net) calls.
+version_added: "0.11.0"
+options:
+  uri:
+    description:
+      - libvirt connection URI.
+    type: str
+    default: qemu:///system
+  networks:
+    description:
+      - Desired networks.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description: Network name.
+        type: str
+        required: true
+      xml:
+        description: Network definition. Required unless O(networks[].state=absent).
+        type: str
+      state:
+        description:
+          - C(active) defines and starts the network, C(inactive) defines it and stops it,
+            C(absent) stops and undefines it.
+        type: str
+        choices: [active, inactive, absent]
+        default: active
+      autostart:
+        description: Whether the network starts with libvirt.
+        type: bool
+        default: true
+  restart_on_change:
+    description:
+      - Restart active networks whose definition changed so the new definition takes effect.
+      - When false, libvirt keeps running the old definition until the network is restarted and
+        the network is reported with RV(networks[].pending_restart).
+    type: bool
+    default: false
+requirements:
+  - libvirt-python
+notes:
+  - Supports check mode and diff mode.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Reconcile libvirt networks
+  tosin2013.qubinode_kvmhost_setup_collection.virt_network_reconcile:
+    networks:
+      - name: qubinet
+        xml: "{{ lookup('ansible.builtin.template', 'libvirt_net_bridge.xml.j2') }}"
+        autostart: true
+      - name: old-nat
+        state: absent
+  register: network_report
+
+- name: Show networks that changed
+  ansible.builtin.debug:
+    msg: "{{ network_report.changed_networks }}"
+'''
+
+RETURN = r'''
+networks:
+  description: Per-network report, in request order.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Network name.
+      type: str
+    changed:
+      description: Whether the network was changed.
+      type: bool
+    actions:
+      description: Actions taken, from C(defined), C(redefined), C(restarted), C(started), C(stopped),
+        C(autostart_enabled), C(autostart_disabled) and C(undefined).
+      type: list
+      elements: str
+    active:
+      description: Whether the network is running after the task.
+      type: bool
+    autostart:
+      description: Whether the network starts with libvirt after the task.
+      type: bool
+    bridge:
+      description: Bridge device of the network, when known.
+      type: str
+    pending_restart:
+      description: Whether a changed definition only takes effect after the network is restarted.
+      type: bool
+changed_networks:
+  description: Names of the networks that were changed.
+  returned: always
+  type: list
+  elements: str
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.virt import (
+    LIBVIRT_ARGUMENT_SPEC,
+    connect,
+    define,
+    libvirt,
+    lookup,
+    parse_xml,
+    remove,
+    set_active,
+    set_autostart,
+)
+
+
+def reconcile(module, conn, spec, diffs):
+    name = spec['name']
+    report = dict(name=name, changed=False, actions=[], active=False, autostart=False, bridge=None,
+                  pending_restart=False)
+    net = lookup(conn.networkLookupByName, name, libvirt.VIR_ERR_NO_NETWORK)
+
+    if spec['state'] == 'absent':
+        remove(module, report, net, diffs)
+        report['changed'] = bool(report['actions'])
+        return report
+
+    if not spec.get('xml'):
+        module.fail_json(msg='Network %s: xml is required unless state=absent' % name)
+    want = parse_xml(module, spec['xml'], 'network %s' % name)
+    if want.findtext('name') != name:
+        module.fail_json(msg='Network %s: the XML <name> is %r' % (name, want.findtext('name')))
+
+    net = define(module, report, net, spec, want, conn.networkDefineXML, libvirt.VIR_NETWORK_XML_INACTIVE, diffs)
+    report.update(
+        active=set_active(module, report, net, spec['state'] == 'active'),
+        autostart=set_autostart(module, report, net, spec['autostart']),
+        bridge=want.find('bridge').get('name') if want.find('bridge') is not None else None,
+    )
+    report['changed'] = bool(report['actions'])
+    return report
+
+
+def main():
+    argument_spec = dict(
+        networks=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                xml=dict(type='str'),
+                state=dict(type='str', default='active', choices=['active', 'inactive', 'absent']),
+                autostart=dict(type='bool', default=True),
+            ),
+        ),
+        restart_on_change=dict(type='bool', default=False),
+    )
+    argument_spec.update(LIBVIRT_ARGUMENT_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+
+    conn = connect(module)
+    reports, diffs = [], []
+    try:
+        for spec in module.params['networks']:
+            reports.append(reconcile(module, conn, spec, diffs))
+    except libvirt.libvirtError as e:
+        module.fail_json(msg='libvirt error: %s' % e, networks=reports)
+    finally:
+        conn.close()
+
+    changed = [report['name'] for report in reports if report['changed']]
+    result = dict(changed=bool(changed), networks=reports, changed_networks=changed)
+    if module._diff:
+        result['diff'] = diffs
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
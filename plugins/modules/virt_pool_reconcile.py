@@ -0,0 +1,271 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: virt_pool_reconcile
+short_description: Reconcile a list of libvirt storage pools over a single connection
+description:
+  - Compares each desired storage pool definition with the persistent definition libvirt holds
+    and defines, builds, starts, stops, autostarts or removes only the pools that differ.
+  - Target directories of C(dir), C(fs) and C(netfs) pools are built when missing, and the mode
+    and ownership of an existing target directory are corrected to match the definition's
+    C(<permissions>).
+  - Active pools are refreshed so new volumes are visible, and capacity figures are returned,
+    replacing per-pool C(virsh pool-info) and C(df) calls.
+  - A live definition matches when it contains every element and attribute of the desired XML;
+    values libvirt fills in itself (uuid, capacity, generated defaults) are not treated as drift.
+version_added: "0.11.0"
+options:
+  uri:
+    description:
+      - libvirt connection URI.
+    type: str
+    default: qemu:///system
+  pools:
+    description:
+      - Desired storage pools.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description: Pool name.
+        type: str
+        required: true
+      xml:
+        description: Pool definition. Required unless O(pools[].state=absent).
+        type: str
+      state:
+        description:
+          - C(active) defines and starts the pool, C(inactive) defines it and stops it,
+            C(absent) stops and undefines it. Volumes and the target directory are kept.
+        type: str
+        choices: [active, inactive, absent]
+        default: active
+      autostart:
+        description: Whether the pool starts with libvirt.
+        type: bool
+        default: true
+      build:
+        description:
+          - Build the pool when its target path does not exist. Only C(dir), C(fs) and C(netfs)
+            pools are built; other pool types are expected to exist already.
+        type: bool
+        default: true
+  refresh:
+    description:
+      - Refresh active pools that were not started by this task so their volume lists are current.
+      - A refresh is not reported as a change.
+    type: bool
+    default: true
+  restart_on_change:
+    description:
+      - Restart active pools whose definition changed so the new definition takes effect.
+      - When false, the pool is reported with RV(pools[].pending_restart).
+    type: bool
+    default: false
+requirements:
+  - libvirt-python
+notes:
+  - Supports check mode and diff mode.
+  - Directory checks run on the managed host, so O(uri) must point at the local libvirt daemon.
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Reconcile libvirt storage pools
+  tosin2013.qubinode_kvmhost_setup_collection.virt_pool_reconcile:
+    pools:
+      - name: default
+        xml: "{{ lookup('ansible.builtin.template', 'libvirt_pool.xml.j2') }}"
+      - name: scratch
+        state: absent
+  register: pool_report
+
+- name: Show pools that changed
+  ansible.builtin.debug:
+    msg: "{{ pool_report.changed_pools }}"
+'''
+
+RETURN = r'''
+pools:
+  description: Per-pool report, in request order.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Pool name.
+      type: str
+    changed:
+      description: Whether the pool was changed.
+      type: bool
+    actions:
+      description: Actions taken, from C(defined), C(redefined), C(restarted), C(built), C(permissions),
+        C(started), C(stopped), C(autostart_enabled), C(autostart_disabled) and C(undefined).
+      type: list
+      elements: str
+    active:
+      description: Whether the pool is running after the task.
+      type: bool
+    autostart:
+      description: Whether the pool starts with libvirt after the task.
+      type: bool
+    type:
+      description: Pool type.
+      type: str
+    path:
+      description: Target path of the pool, when it has one.
+      type: str
+    capacity:
+      description: Pool capacity in bytes, C(null) when the pool is not running.
+      type: int
+    allocation:
+      description: Allocated bytes, C(null) when the pool is not running.
+      type: int
+    available:
+      description: Free bytes, C(null) when the pool is not running.
+      type: int
+    pending_restart:
+      description: Whether a changed definition only takes effect after the pool is restarted.
+      type: bool
+changed_pools:
+  description: Names of the pools that were changed.
+  returned: always
+  type: list
+  elements: str
+'''
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.virt import (
+    LIBVIRT_ARGUMENT_SPEC,
+    connect,
+    define,
+    libvirt,
+    lookup,
+    parse_xml,
+    remove,
+    set_active,
+    set_autostart,
+)
+
+# Pool types whose target is a local directory that build creates
+DIRECTORY_POOL_TYPES = ('dir', 'fs', 'netfs')
+
+
+def ensure_directory(module, report, pool, want, spec):
+    """Build a missing target directory and correct the permissions of an existing one."""
+    path = want.findtext('target/path')
+    if want.get('type') not in DIRECTORY_POOL_TYPES or not path:
+        return
+    if not os.path.isdir(path):
+        # libvirt refuses to build a running pool
+        if spec['build'] and (pool is None or not pool.isActive()):
+            report['actions'].append('built')
+            if not module.check_mode:
+                pool.build(libvirt.VIR_STORAGE_POOL_BUILD_NEW)
+        return
+
+    # fs and netfs targets are mount points whose permissions belong to the mounted filesystem
+    permissions = want.find('target/permissions')
+    if want.get('type') != 'dir' or permissions is None:
+        return
+    st = os.stat(path)
+    mode = permissions.findtext('mode')
+    owner = permissions.findtext('owner')
+    group = permissions.findtext('group')
+    wrong_mode = mode is not None and (st.st_mode & 0o7777) != int(mode, 8)
+    wrong_owner = (owner is not None and st.st_uid != int(owner)) or (group is not None and st.st_gid != int(group))
+    if wrong_mode or wrong_owner:
+        report['actions'].append('permissions')
+        if not module.check_mode:
+            if wrong_mode:
+                os.chmod(path, int(mode, 8))
+            if wrong_owner:
+                os.chown(path, int(owner) if owner is not None else -1, int(group) if group is not None else -1)
+
+
+def reconcile(module, conn, spec, diffs):
+    name = spec['name']
+    report = dict(name=name, changed=False, actions=[], active=False, autostart=False, type=None, path=None,
+                  capacity=None, allocation=None, available=None, pending_restart=False)
+    pool = lookup(conn.storagePoolLookupByName, name, libvirt.VIR_ERR_NO_STORAGE_POOL)
+
+    if spec['state'] == 'absent':
+        remove(module, report, pool, diffs)
+        report['changed'] = bool(report['actions'])
+        return report
+
+    if not spec.get('xml'):
+        module.fail_json(msg='Pool %s: xml is required unless state=absent' % name)
+    want = parse_xml(module, spec['xml'], 'pool %s' % name)
+    if want.findtext('name') != name:
+        module.fail_json(msg='Pool %s: the XML <name> is %r' % (name, want.findtext('name')))
+
+    pool = define(module, report, pool, spec, want, conn.storagePoolDefineXML, libvirt.VIR_STORAGE_XML_INACTIVE, diffs)
+    ensure_directory(module, report, pool, want, spec)
+    was_active = pool is not None and bool(pool.isActive())
+    active = set_active(module, report, pool, spec['state'] == 'active')
+    report.update(
+        active=active,
+        autostart=set_autostart(module, report, pool, spec['autostart']),
+        type=want.get('type'),
+        path=want.findtext('target/path'),
+    )
+
+    if active and not module.check_mode:
+        if was_active and module.params['refresh']:
+            pool.refresh(0)
+        dummy, capacity, allocation, available = pool.info()
+        report.update(capacity=capacity, allocation=allocation, available=available)
+    report['changed'] = bool(report['actions'])
+    return report
+
+
+def main():
+    argument_spec = dict(
+        pools=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                xml=dict(type='str'),
+                state=dict(type='str', default='active', choices=['active', 'inactive', 'absent']),
+                autostart=dict(type='bool', default=True),
+                build=dict(type='bool', default=True),
+            ),
+        ),
+        refresh=dict(type='bool', default=True),
+        restart_on_change=dict(type='bool', default=False),
+    )
+    argument_spec.update(LIBVIRT_ARGUMENT_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+
+    conn = connect(module)
+    reports, diffs = [], []
+    try:
+        for spec in module.params['pools']:
+            reports.append(reconcile(module, conn, spec, diffs))
+    except libvirt.libvirtError as e:
+        module.fail_json(msg='libvirt error: %s' % e, pools=reports)
+    finally:
+        conn.close()
+
+    changed = [report['name'] for report in reports if report['changed']]
+    result = dict(changed=bool(changed), pools=reports, changed_pools=changed)
+    if module._diff:
+        result['diff'] = diffs
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
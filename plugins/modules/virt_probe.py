@@ -0,0 +1,387 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+DOCUMENTATION = r'''
+---
+module: virt_probe
+short_description: Collect libvirt and KVM host health as structured data over a single connection
+description:
+  - Opens one libvirt connection and returns the daemon and hypervisor versions, networks, storage
+    pools with capacity and allocation, domain counts and driver capabilities in one result.
+  - Replaces C(virsh version), C(virsh net-info), C(virsh pool-info) and C(virsh list) calls whose
+    output had to be matched with substring checks.
+  - Host virtualization support (CPU flags, loaded KVM modules, C(/dev/kvm), nested
+    virtualization) is read from C(/proc) and C(/sys) and is returned even when libvirt is not
+    installed or not running.
+  - Never changes the host.
+version_added: "0.11.0"
+options:
+  uri:
+    description:
+      - libvirt connection URI.
+    type: str
+    default: qemu:///system
+  gather:
+    description:
+      - Sections to collect from libvirt. C(host) is always collected.
+    type: list
+    elements: str
+    choices: [version, networks, pools, domains, capabilities]
+    default: [version, networks, pools, domains, capabilities]
+  fail_on_error:
+    description:
+      - Fail when libvirt-python is missing or the daemon cannot be reached.
+      - When false, RV(connected) is false and RV(error) explains why.
+    type: bool
+    default: false
+notes:
+  - Supports check mode.
+requirements:
+  - libvirt-python
+author:
+  - Qubinode Project
+'''
+
+EXAMPLES = r'''
+- name: Probe libvirt
+  tosin2013.qubinode_kvmhost_setup_collection.virt_probe:
+  register: kvmhost_virt_probe
+
+- name: Assert the default pool is running
+  ansible.builtin.assert:
+    that:
+      - kvmhost_virt_probe.connected
+      - (kvmhost_virt_probe.pools | selectattr('name', 'eq', 'default') | first).active
+
+- name: Check access as the login user
+  tosin2013.qubinode_kvmhost_setup_collection.virt_probe:
+    gather: [version]
+  become: false
+  register: user_probe
+'''
+
+RETURN = r'''
+connected:
+  description: Whether the libvirt connection succeeded.
+  returned: always
+  type: bool
+error:
+  description: Why the connection failed, C(null) when it succeeded.
+  returned: always
+  type: str
+uri:
+  description: Canonical URI of the connection.
+  returned: when connected
+  type: str
+host:
+  description: Host virtualization support, collected without libvirt.
+  returned: always
+  type: dict
+  contains:
+    vt_supported:
+      description: Whether the CPU advertises C(vmx) or C(svm).
+      type: bool
+    vt_flag:
+      description: The virtualization CPU flag found, C(vmx), C(svm) or C(null).
+      type: str
+    kvm_modules:
+      description: Loaded KVM kernel modules.
+      type: list
+      elements: str
+    kvm_device:
+      description: Whether C(/dev/kvm) exists.
+      type: bool
+    nested:
+      description: Whether nested virtualization is enabled in the loaded KVM module.
+      type: bool
+version:
+  description: Daemon and hypervisor versions.
+  returned: when connected and C(version) is gathered
+  type: dict
+  contains:
+    libvirt:
+      description: libvirt daemon version, for example C(10.0.0).
+      type: str
+    hypervisor:
+      description: Hypervisor driver name, for example C(QEMU).
+      type: str
+    hypervisor_version:
+      description: Hypervisor version, for example C(8.2.0).
+      type: str
+    hostname:
+      description: Hostname reported by the daemon.
+      type: str
+networks:
+  description: Defined and transient networks.
+  returned: when connected and C(networks) is gathered
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Network name.
+      type: str
+    active:
+      description: Whether the network is running.
+      type: bool
+    autostart:
+      description: Whether the network starts with libvirt.
+      type: bool
+    persistent:
+      description: Whether the network has a persistent definition.
+      type: bool
+    bridge:
+      description: Bridge device, C(null) when the network has none.
+      type: str
+pools:
+  description: Defined and transient storage pools.
+  returned: when connected and C(pools) is gathered
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: Pool name.
+      type: str
+    type:
+      description: Pool type.
+      type: str
+    path:
+      description: Target path, C(null) when the pool has none.
+      type: str
+    active:
+      description: Whether the pool is running.
+      type: bool
+    autostart:
+      description: Whether the pool starts with libvirt.
+      type: bool
+    capacity:
+      description: Capacity in bytes, C(0) when the pool is not running.
+      type: int
+    allocation:
+      description: Allocated bytes.
+      type: int
+    available:
+      description: Free bytes.
+      type: int
+domains:
+  description: Domain counts by state.
+  returned: when connected and C(domains) is gathered
+  type: dict
+  contains:
+    total:
+      description: Number of domains.
+      type: int
+    running:
+      description: Running domains.
+      type: int
+    paused:
+      description: Paused domains.
+      type: int
+    shutoff:
+      description: Shut off domains.
+      type: int
+    other:
+      description: Domains in any other state.
+      type: int
+    names:
+      description: Names of the running domains.
+      type: list
+      elements: str
+capabilities:
+  description: Driver capabilities.
+  returned: when connected and C(capabilities) is gathered
+  type: dict
+  contains:
+    arch:
+      description: Host architecture.
+      type: str
+    cpu_model:
+      description: Host CPU model as named by libvirt.
+      type: str
+    cpu_vendor:
+      description: Host CPU vendor.
+      type: str
+    kvm:
+      description: Whether the driver can run KVM accelerated guests.
+      type: bool
+    guest_arches:
+      description: Guest architectures the driver can emulate.
+      type: list
+      elements: str
+    iommu:
+      description: Whether the host has an IOMMU enabled.
+      type: bool
+'''
+
+import os
+import xml.etree.ElementTree as ET
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.module_utils.virt import (
+    LIBVIRT_ARGUMENT_SPEC,
+    libvirt,
+    open_connection,
+)
+
+KVM_MODULES = ('kvm', 'kvm_intel', 'kvm_amd')
+# virDomainState values; the libvirt constants are not available when the binding is missing
+DOMAIN_RUNNING = 1
+DOMAIN_PAUSED = 3
+DOMAIN_SHUTOFF = 5
+
+
+def format_version(number):
+    """libvirt encodes versions as major * 1000000 + minor * 1000 + release."""
+    return '%d.%d.%d' % (number // 1000000, number // 1000 % 1000, number % 1000)
+
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def probe_host():
+    flags = set()
+    for line in (read_file('/proc/cpuinfo') or '').splitlines():
+        if line.startswith('flags'):
+            flags.update(line.partition(':')[2].split())
+            break
+    vt_flag = 'vmx' if 'vmx' in flags else 'svm' if 'svm' in flags else None
+    modules = [name for name in KVM_MODULES if os.path.isdir('/sys/module/%s' % name)]
+    nested = False
+    for name in ('kvm_intel', 'kvm_amd'):
+        value = (read_file('/sys/module/%s/parameters/nested' % name) or '').strip()
+        nested = nested or value in ('Y', 'y', '1')
+    return dict(
+        vt_supported=vt_flag is not None,
+        vt_flag=vt_flag,
+        kvm_modules=modules,
+        kvm_device=os.path.exists('/dev/kvm'),
+        nested=nested,
+    )
+
+
+def probe_version(conn):
+    hypervisor_version = conn.getVersion()
+    return dict(
+        libvirt=format_version(conn.getLibVersion()),
+        hypervisor=conn.getType(),
+        hypervisor_version=format_version(hypervisor_version) if hypervisor_version else None,
+        hostname=conn.getHostname(),
+    )
+
+
+def probe_networks(conn):
+    networks = []
+    for net in conn.listAllNetworks(0):
+        bridge = ET.fromstring(net.XMLDesc(0)).find('bridge')
+        networks.append(dict(
+            name=net.name(),
+            active=bool(net.isActive()),
+            autostart=bool(net.autostart()),
+            persistent=bool(net.isPersistent()),
+            bridge=bridge.get('name') if bridge is not None else None,
+        ))
+    return sorted(networks, key=lambda net: net['name'])
+
+
+def probe_pools(conn):
+    pools = []
+    for pool in conn.listAllStoragePools(0):
+        xml = ET.fromstring(pool.XMLDesc(0))
+        dummy, capacity, allocation, available = pool.info()
+        pools.append(dict(
+            name=pool.name(),
+            type=xml.get('type'),
+            path=xml.findtext('target/path'),
+            active=bool(pool.isActive()),
+            autostart=bool(pool.autostart()),
+            capacity=capacity,
+            allocation=allocation,
+            available=available,
+        ))
+    return sorted(pools, key=lambda pool: pool['name'])
+
+
+def probe_domains(conn):
+    counts = dict(total=0, running=0, paused=0, shutoff=0, other=0, names=[])
+    for domain in conn.listAllDomains(0):
+        state = domain.state()[0]
+        counts['total'] += 1
+        if state == DOMAIN_RUNNING:
+            counts['running'] += 1
+            counts['names'].append(domain.name())
+        elif state == DOMAIN_PAUSED:
+            counts['paused'] += 1
+        elif state == DOMAIN_SHUTOFF:
+            counts['shutoff'] += 1
+        else:
+            counts['other'] += 1
+    counts['names'].sort()
+    return counts
+
+
+def probe_capabilities(conn):
+    caps = ET.fromstring(conn.getCapabilities())
+    guests = caps.findall('guest')
+    iommu = caps.find('host/iommu')
+    return dict(
+        arch=caps.findtext('host/cpu/arch'),
+        cpu_model=caps.findtext('host/cpu/model'),
+        cpu_vendor=caps.findtext('host/cpu/vendor'),
+        kvm=any(guest.find("arch/domain[@type='kvm']") is not None for guest in guests),
+        guest_arches=sorted(set(guest.find('arch').get('name') for guest in guests if guest.find('arch') is not None)),
+        iommu=iommu is not None and iommu.get('support') == 'yes',
+    )
+
+
+PROBES = dict(
+    version=probe_version,
+    networks=probe_networks,
+    pools=probe_pools,
+    domains=probe_domains,
+    capabilities=probe_capabilities,
+)
+
+
+def main():
+    argument_spec = dict(
+        gather=dict(type='list', elements='str', choices=list(PROBES),
+                    default=['version', 'networks', 'pools', 'domains', 'capabilities']),
+        fail_on_error=dict(type='bool', default=False),
+    )
+    argument_spec.update(LIBVIRT_ARGUMENT_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+    params = module.params
+
+    result = dict(changed=False, connected=False, error=None, host=probe_host())
+    if libvirt is None:
+        result['error'] = 'libvirt-python is not installed'
+    else:
+        try:
+            conn = open_connection(params['uri'])
+        except libvirt.libvirtError as e:
+            result['error'] = 'Failed to connect to %s: %s' % (params['uri'], e)
+        else:
+            try:
+                result.update(connected=True, uri=conn.getURI())
+                for section in params['gather']:
+                    result[section] = PROBES[section](conn)
+            except libvirt.libvirtError as e:
+                module.fail_json(msg='libvirt error while probing: %s' % e, **result)
+            finally:
+                conn.close()
+
+    if not result['connected'] and params['fail_on_error']:
+        module.fail_json(msg=result['error'], **result)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
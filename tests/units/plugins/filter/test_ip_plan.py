@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+import pytest
+
+from ansible.errors import AnsibleFilterError
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.filter.ip_plan import (
+    ip_plan_conflicts,
+    libvirt_network_addressing,
+)
+
+
+def kinds(conflicts):
+    return sorted(conflict['kind'] for conflict in conflicts)
+
+
+def nat(name='default', **kwargs):
+    return dict(name=name, mode='nat', **kwargs)
+
+
+class TestLibvirtNetworkAddressing:
+
+    def test_defaults_follow_mode_and_index(self):
+        assert libvirt_network_addressing(nat(), 0) == dict(
+            address='192.168.100.1', netmask='255.255.255.0', prefix=24, subnet='192.168.100.0/24',
+            dhcp_start='192.168.100.2', dhcp_end='192.168.100.254')
+        assert libvirt_network_addressing(dict(name='lab', mode='isolated'), 2)['subnet'] == '192.168.202.0/24'
+
+    def test_mode_argument_overrides_network_mode(self):
+        assert libvirt_network_addressing(dict(name='lab'), 1, mode='nat')['address'] == '192.168.101.1'
+
+    def test_bridge_networks_have_no_addressing(self):
+        assert libvirt_network_addressing(dict(name='br0', mode='bridge')) is None
+        assert libvirt_network_addressing(dict(name='br0')) is None
+
+    def test_address_and_dhcp_range_overrides(self):
+        addressing = libvirt_network_addressing(
+            nat(address='10.0.0.1/23', dhcp_range=dict(start='10.0.1.0', end='10.0.1.200')))
+        assert addressing['subnet'] == '10.0.0.0/23'
+        assert addressing['netmask'] == '255.255.254.0'
+        assert (addressing['dhcp_start'], addressing['dhcp_end']) == ('10.0.1.0', '10.0.1.200')
+
+    def test_partial_dhcp_range_keeps_the_default_end(self):
+        addressing = libvirt_network_addressing(nat(dhcp_range=dict(start='192.168.100.100')))
+        assert (addressing['dhcp_start'], addressing['dhcp_end']) == ('192.168.100.100', '192.168.100.254')
+
+    def test_ipv6_address(self):
+        addressing = libvirt_network_addressing(nat(address='fd00:1::1/64'))
+        assert addressing['prefix'] == 64
+        assert addressing['dhcp_start'] == 'fd00:1::2'
+
+    def test_invalid_address(self):
+        with pytest.raises(AnsibleFilterError, match='network default address'):
+            libvirt_network_addressing(nat(address='10.0.0.300/24'))
+
+
+class TestIpPlanConflicts:
+
+    def test_clean_plan(self):
+        plan = [
+            dict(host='a', addresses=['10.1.0.10/24'], networks=[
+                nat(dhcp_range=dict(start='192.168.100.100', end='192.168.100.254'),
+                    dhcp_hosts=[dict(name='vm1', mac='52:54:00:00:00:01', ip='192.168.100.10')])]),
+            dict(host='b', addresses=['10.1.0.11/24'], networks=[nat(address='192.168.110.1/24')]),
+        ]
+        assert ip_plan_conflicts(plan) == []
+
+    def test_rejects_non_list(self):
+        with pytest.raises(AnsibleFilterError):
+            ip_plan_conflicts(dict(host='a'))
+
+    def test_subnet_overlap_on_one_host(self):
+        plan = [dict(host='a', addresses=['192.168.100.5/24'], networks=[nat()])]
+        assert kinds(ip_plan_conflicts(plan)) == ['subnet_overlap']
+
+    def test_absent_and_external_networks_are_skipped(self):
+        plan = [dict(host='a', addresses=['192.168.100.5/24'], networks=[
+            nat(state='absent'), nat(name='ext', create=False), dict(name='br0', mode='bridge')])]
+        assert ip_plan_conflicts(plan) == []
+
+    def test_dhcp_range_checks(self):
+        plan = [dict(host='a', networks=[
+            nat('outside', dhcp_range=dict(start='192.168.100.10', end='192.168.101.20')),
+            nat('gateway', address='10.2.0.1/24', dhcp_range=dict(start='10.2.0.1', end='10.2.0.50')),
+        ])]
+        assert kinds(ip_plan_conflicts(plan)) == ['dhcp_range_gateway', 'dhcp_range_invalid']
+
+    def test_reservation_checks(self):
+        hosts = [
+            dict(name='in-range', mac='52:54:00:00:00:01', ip='192.168.100.50'),
+            dict(name='gateway', mac='52:54:00:00:00:02', ip='192.168.100.1'),
+            dict(name='outside', mac='52:54:00:00:00:03', ip='192.168.200.5'),
+            dict(name='first', mac='52:54:00:00:00:04', ip='192.168.100.20'),
+            dict(name='same-ip', mac='52:54:00:00:00:05', ip='192.168.100.20'),
+            dict(name='same-mac', mac='52:54:00:00:00:04', ip='192.168.100.21'),
+        ]
+        plan = [dict(host='a', networks=[
+            nat(dhcp_range=dict(start='192.168.100.50', end='192.168.100.99'), dhcp_hosts=hosts)])]
+        assert kinds(ip_plan_conflicts(plan)) == [
+            'reservation_duplicate_ip', 'reservation_duplicate_mac', 'reservation_gateway',
+            'reservation_in_dhcp_range', 'reservation_outside_subnet']
+
+    def test_mixed_address_families_are_reported(self):
+        plan = [dict(host='a', networks=[
+            nat('v6-range', address='10.3.0.1/24', dhcp_range=dict(start='fd00::10', end='fd00::20'),
+                dhcp_hosts=[dict(name='vm1', ip='10.3.0.10')]),
+            nat('v6-host', address='10.4.0.1/24', dhcp_range=dict(start='10.4.0.100', end='10.4.0.200'),
+                dhcp_hosts=[dict(name='vm2', ip='fd00::5')]),
+        ])]
+        conflicts = ip_plan_conflicts(plan)
+        assert kinds(conflicts) == ['dhcp_range_family', 'reservation_family']
+        assert 'is not IPv4 like 10.4.0.0/24' in conflicts[1]['message']
+
+    def test_ipv4_and_ipv6_subnets_do_not_overlap(self):
+        plan = [dict(host='a', addresses=['10.5.0.2/24', 'fd00:5::2/64'],
+                     networks=[nat(address='fd00:6::1/64')])]
+        assert ip_plan_conflicts(plan) == []
+
+    def test_address_reused_in_l2_domain(self):
+        plan = [
+            dict(host='a', addresses=['10.1.0.10/24'], networks=[nat(address='192.168.110.1/24')]),
+            dict(host='b', addresses=['10.1.0.10/24'], networks=[nat(address='192.168.120.1/24')]),
+        ]
+        conflicts = ip_plan_conflicts(plan)
+        assert kinds(conflicts) == ['address_reused']
+        assert conflicts[0]['hosts'] == ['a', 'b']
+
+    def test_subnet_reused_in_l2_domain_is_one_warning(self):
+        plan = [dict(host=host, addresses=['10.1.0.%d/24' % index], networks=[nat()])
+                for index, host in enumerate(['a', 'b', 'c'], 10)]
+        conflicts = ip_plan_conflicts(plan)
+        assert [(conflict['severity'], conflict['kind']) for conflict in conflicts] == [('warning', 'subnet_reused')]
+        assert conflicts[0]['hosts'] == ['a', 'b', 'c']
+
+    def test_separate_l2_domains_may_reuse_subnets(self):
+        plan = [dict(host=host, l2_domain=host, networks=[nat()]) for host in ('a', 'b')]
+        assert ip_plan_conflicts(plan) == []
+
+    def test_overlapping_subnets_across_hosts(self):
+        plan = [
+            dict(host='a', l2_domain='lan', networks=[nat(address='10.8.0.1/16')]),
+            dict(host='b', l2_domain='lan', networks=[nat(address='10.8.4.1/24')]),
+        ]
+        conflicts = ip_plan_conflicts(plan)
+        assert kinds(conflicts) == ['subnet_reused']
+        assert '10.8.0.0/16 on a overlaps 10.8.4.0/24 on b' in conflicts[0]['message']
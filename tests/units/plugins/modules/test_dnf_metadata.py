@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+import os
+
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.modules.dnf_metadata import metadata_age
+
+NOW = 1700000000
+
+
+def cache(tmp_path, name, age):
+    repodata = tmp_path / name / 'repodata'
+    repodata.mkdir(parents=True)
+    path = repodata / 'repomd.xml'
+    path.write_text(u'')
+    os.utime(str(path), (NOW - age, NOW - age))
+
+
+def test_age_of_the_newest_repodata_file(tmp_path):
+    cache(tmp_path, 'baseos-0123456789abcdef', 7200)
+    assert metadata_age('baseos', [str(tmp_path)], NOW) == 7200
+
+
+def test_uncached_repo(tmp_path):
+    assert metadata_age('baseos', [str(tmp_path), str(tmp_path / 'missing')], NOW) is None
+
+
+def test_sibling_repos_sharing_a_prefix_are_ignored(tmp_path):
+    cache(tmp_path, 'epel-0123456789abcdef', 2 * 86400)
+    cache(tmp_path, 'epel-next-fedcba9876543210', 60)
+    cache(tmp_path, 'epel-debuginfo-00112233445566ff', 60)
+    assert metadata_age('epel', [str(tmp_path)], NOW) == 2 * 86400
+    assert metadata_age('epel-next', [str(tmp_path)], NOW) == 60
+    assert metadata_age('epel-testing', [str(tmp_path)], NOW) is None
+
+
+def test_newest_cache_across_cache_roots(tmp_path):
+    dnf4, dnf5 = tmp_path / 'dnf', tmp_path / 'libdnf5'
+    cache(dnf4, 'appstream-0123456789abcdef', 86400)
+    cache(dnf5, 'appstream-0123456789abcdef', 300)
+    assert metadata_age('appstream', [str(dnf4), str(dnf5)], NOW) == 300
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.modules.kernel_args import (
+    default_args_line,
+    merge_cmdline,
+    merge_requests,
+    update_grub_defaults,
+)
+
+GRUB_DEFAULTS = '''GRUB_TIMEOUT=5
+GRUB_DISTRIBUTOR="$(sed 's, release .*$,,g' /etc/system-release)"
+GRUB_CMDLINE_LINUX_DEFAULT="nomodeset"
+GRUB_CMDLINE_LINUX="crashkernel=1G-4G:192M resume=/dev/mapper/rhel-swap rhgb quiet"
+GRUB_DISABLE_RECOVERY="true"
+'''
+
+
+class TestMergeRequests:
+
+    def test_repeated_names_keep_the_last_value(self):
+        args, remove = merge_requests(['hugepages=8', 'iommu=pt', 'hugepages=16'], [])
+        assert args == ['iommu=pt', 'hugepages=16']
+        assert remove == []
+
+    def test_removals_of_wanted_names_are_dropped(self):
+        args, remove = merge_requests(['isolcpus=2-3'], ['isolcpus', 'nohz_full', 'rhgb=1'])
+        assert args == ['isolcpus=2-3']
+        assert remove == ['nohz_full', 'rhgb=1']
+
+    def test_repeated_removals_are_kept_once(self):
+        assert merge_requests([], ['quiet', 'rhgb', 'quiet']) == ([], ['quiet', 'rhgb'])
+
+
+class TestMergeCmdline:
+
+    def test_adds_missing_arguments_at_the_end(self):
+        assert merge_cmdline(['ro', 'quiet'], ['iommu=pt', 'intel_iommu=on'], []) == \
+            ['ro', 'quiet', 'iommu=pt', 'intel_iommu=on']
+
+    def test_replaces_a_value_in_place(self):
+        assert merge_cmdline(['ro', 'hugepages=8', 'quiet'], ['hugepages=16'], []) == ['ro', 'hugepages=16', 'quiet']
+
+    def test_repeated_current_arguments_collapse_into_the_wanted_one(self):
+        current = ['console=tty0', 'ro', 'console=ttyS0']
+        assert merge_cmdline(current, ['console=ttyS0,115200'], []) == ['console=ttyS0,115200', 'ro']
+
+    def test_repeated_current_arguments_are_kept_when_not_requested(self):
+        current = ['console=tty0', 'ro', 'console=ttyS0']
+        assert merge_cmdline(current, ['quiet'], []) == current + ['quiet']
+
+    def test_remove_by_name_drops_every_value(self):
+        current = ['ro', 'isolcpus=2-3', 'nohz_full=2-3', 'console=tty0', 'console=ttyS0', 'rhgb']
+        assert merge_cmdline(current, [], ['isolcpus', 'nohz_full', 'console', 'rhgb']) == ['ro']
+
+    def test_remove_by_value_drops_only_that_value(self):
+        current = ['console=tty0', 'console=ttyS0', 'rhgb']
+        assert merge_cmdline(current, [], ['console=tty0', 'rhgb=1']) == ['console=ttyS0', 'rhgb']
+
+    def test_wanted_arguments_win_over_removals(self):
+        args, remove = merge_requests(['isolcpus=4-7'], ['isolcpus', 'rcu_nocbs'])
+        assert merge_cmdline(['isolcpus=2-3', 'rcu_nocbs=2-3'], args, remove) == ['isolcpus=4-7']
+
+    def test_merge_is_idempotent(self):
+        args, remove = merge_requests(['hugepages=16', 'iommu=pt'], ['rhgb', 'isolcpus'])
+        once = merge_cmdline(['ro', 'rhgb', 'isolcpus=2-3', 'hugepages=8'], args, remove)
+        assert merge_cmdline(once, args, remove) == once
+
+
+class TestGrubDefaults:
+
+    def test_default_args_line(self):
+        assert default_args_line(GRUB_DEFAULTS) == 'crashkernel=1G-4G:192M resume=/dev/mapper/rhel-swap rhgb quiet'
+        assert default_args_line("GRUB_CMDLINE_LINUX='ro quiet'\n") == 'ro quiet'
+        assert default_args_line('GRUB_TIMEOUT=5\n') is None
+        assert default_args_line(None) is None
+
+    def test_rewrites_only_grub_cmdline_linux(self):
+        text = update_grub_defaults(GRUB_DEFAULTS, ['iommu=pt', 'hugepages=16'], ['rhgb', 'quiet'])
+        assert text == GRUB_DEFAULTS.replace(
+            'resume=/dev/mapper/rhel-swap rhgb quiet', 'resume=/dev/mapper/rhel-swap iommu=pt hugepages=16')
+
+    def test_repeated_names_and_removals(self):
+        text = 'GRUB_CMDLINE_LINUX="console=tty0 isolcpus=1 console=ttyS0 nohz_full=1 quiet"\n'
+        args, remove = merge_requests(['console=ttyS0,115200', 'console=tty0'], ['isolcpus', 'nohz_full=2'])
+        assert args == ['console=tty0']
+        assert update_grub_defaults(text, args, remove) == \
+            'GRUB_CMDLINE_LINUX="console=tty0 nohz_full=1 quiet"\n'
+
+    def test_appends_the_line_when_missing(self):
+        assert update_grub_defaults('GRUB_TIMEOUT=5\n', ['iommu=pt'], ['quiet']) == \
+            'GRUB_TIMEOUT=5\nGRUB_CMDLINE_LINUX="iommu=pt"\n'
+
+    def test_unchanged_when_already_merged(self):
+        assert update_grub_defaults(GRUB_DEFAULTS, ['rhgb'], ['splash']) == GRUB_DEFAULTS
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+from ansible.module_utils import basic
+from ansible.module_utils.common.text.converters import to_bytes
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.modules import sysctl_profile
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.modules.sysctl_profile import (
+    GIB,
+    MIB,
+    profile_settings,
+    render,
+    resolve,
+)
+
+PROFILE = 'profile throughput'
+
+
+class ModuleExit(Exception):
+    pass
+
+
+def exit_json(self, **kwargs):
+    raise ModuleExit(kwargs)
+
+
+def fail_json(self, **kwargs):
+    kwargs['failed'] = True
+    raise ModuleExit(kwargs)
+
+
+@pytest.fixture
+def run_module(monkeypatch):
+    monkeypatch.setattr(basic.AnsibleModule, 'exit_json', exit_json)
+    monkeypatch.setattr(basic.AnsibleModule, 'fail_json', fail_json)
+
+    def run(**args):
+        monkeypatch.setattr(basic, '_ANSIBLE_ARGS', to_bytes(json.dumps(dict(ANSIBLE_MODULE_ARGS=args))))
+        with pytest.raises(ModuleExit) as result:
+            sysctl_profile.main()
+        return result.value.args[0]
+    return run
+
+
+@pytest.fixture
+def host(tmp_path):
+    """A procfs with 16 GiB of memory, IP forwarding off and a drop-in path."""
+    proc = tmp_path / 'proc'
+    (proc / 'sys/net/ipv4').mkdir(parents=True)
+    (proc / 'sys/vm').mkdir(parents=True)
+    (proc / 'meminfo').write_text(u'MemTotal:       16777216 kB\n')
+    (proc / 'sys/net/ipv4/ip_forward').write_text(u'0\n')
+    (proc / 'sys/vm/swappiness').write_text(u'60\n')
+    return dict(proc=str(proc), path=str(tmp_path / '90-qubinode-sysctl.conf'))
+
+
+def set_running(host, key, value):
+    path = sysctl_profile.proc_path(host['proc'], key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('%s\n' % value)
+
+
+class TestProfileSettings:
+
+    def test_dirty_thresholds_scale_with_memory_up_to_the_cap(self):
+        small = profile_settings('throughput', 8 * GIB)
+        assert small['vm.dirty_background_bytes'] == str(8 * GIB * 5 // 100)
+        assert small['vm.dirty_bytes'] == str(8 * GIB * 10 // 100)
+        large = profile_settings('throughput', 512 * GIB)
+        assert large['vm.dirty_background_bytes'] == str(1 * GIB)
+        assert large['vm.dirty_bytes'] == str(4 * GIB)
+
+    def test_dirty_thresholds_have_a_floor(self):
+        settings = profile_settings('latency', 512 * MIB)
+        assert settings['vm.dirty_background_bytes'] == str(16 * MIB)
+        assert settings['vm.dirty_bytes'] == str(64 * MIB)
+
+    def test_unknown_memory_leaves_dirty_thresholds_out(self):
+        assert 'vm.dirty_bytes' not in profile_settings('density', 0)
+
+    def test_values_are_normalized_strings(self):
+        settings = profile_settings('latency', 0)
+        assert settings['kernel.numa_balancing'] == '0'
+        assert settings['vm.swappiness'] == '1'
+
+    def test_none_profile_is_empty(self):
+        assert profile_settings('none', 16 * GIB) == {}
+
+    def test_zram_swap_raises_swappiness_on_newer_kernels(self):
+        for name, swappiness in (('density', '180'), ('throughput', '150'), ('latency', '100')):
+            settings = profile_settings(name, 0, 'zram', (5, 14))
+            assert settings['vm.swappiness'] == swappiness
+            assert settings['vm.page-cluster'] == '0'
+
+    def test_zram_swap_is_capped_at_100_before_5_8(self):
+        assert profile_settings('density', 0, 'zram', (4, 18))['vm.swappiness'] == '100'
+        assert profile_settings('density', 0, 'zram')['vm.swappiness'] == '100'
+
+    def test_zram_swap_without_profile(self):
+        assert profile_settings('none', 0, 'zram', (5, 14)) == {}
+
+
+class TestResolve:
+
+    def test_requests_and_overrides_in_order(self):
+        settings, sources, conflicts = resolve([
+            (PROFILE, {'vm.swappiness': 10, 'vm.dirty_bytes': 100 * MIB}),
+            ('kvmhost_base', {'net.ipv4.ip_forward': 1}),
+            ('overrides', {'vm.swappiness': 5}),
+        ], 16 * GIB)
+        assert settings == {'vm.swappiness': '5', 'vm.dirty_bytes': str(100 * MIB), 'net.ipv4.ip_forward': '1'}
+        assert sources == {
+            'vm.swappiness': 'overrides', 'vm.dirty_bytes': PROFILE, 'net.ipv4.ip_forward': 'kvmhost_base'}
+        assert conflicts == []
+
+    def test_request_differing_from_the_profile_is_a_conflict(self):
+        settings, sources, conflicts = resolve([
+            (PROFILE, {'vm.swappiness': 10}),
+            ('kvmhost_storage', {'vm.swappiness': 1}),
+            ('overrides', {}),
+        ], 0)
+        assert settings['vm.swappiness'] == '1'
+        assert [(item['key'], item['resolved']) for item in conflicts] == [('vm.swappiness', '1')]
+        assert conflicts[0]['values'] == [dict(source=PROFILE, value='10'), dict(source='kvmhost_storage', value='1')]
+
+    def test_override_settles_a_conflict(self):
+        dummy, sources, conflicts = resolve([
+            (PROFILE, {}),
+            ('kvmhost_setup', {'net.core.somaxconn': 1024}),
+            ('kvmhost_storage', {'net.core.somaxconn': 4096}),
+            ('overrides', {'net.core.somaxconn': 2048}),
+        ], 0)
+        assert sources['net.core.somaxconn'] == 'overrides'
+        assert conflicts == []
+
+    def test_ratio_replaces_the_profile_bytes_threshold(self):
+        settings, dummy, conflicts = resolve([
+            (PROFILE, {'vm.dirty_bytes': 400 * MIB, 'vm.dirty_background_bytes': 100 * MIB}),
+            ('kvmhost_storage', {'vm.dirty_ratio': 20}),
+            ('overrides', {}),
+        ], 16 * GIB)
+        assert 'vm.dirty_bytes' not in settings
+        assert settings['vm.dirty_ratio'] == '20'
+        assert conflicts == []
+
+    def test_ratio_replacing_another_request_is_a_conflict(self):
+        settings, dummy, conflicts = resolve([
+            (PROFILE, {}),
+            ('kvmhost_setup', {'vm.dirty_bytes': 400 * MIB}),
+            ('kvmhost_storage', {'vm.dirty_ratio': 20}),
+            ('overrides', {}),
+        ], 16 * GIB)
+        assert settings == {'vm.dirty_ratio': '20'}
+        assert [item['reason'] for item in conflicts] == [
+            'vm.dirty_ratio from kvmhost_storage replaces vm.dirty_bytes from kvmhost_setup']
+
+    def test_both_forms_from_one_source_keep_the_bytes(self):
+        settings, dummy, conflicts = resolve([
+            (PROFILE, {}),
+            ('overrides', {'vm.dirty_ratio': 20, 'vm.dirty_bytes': 400 * MIB}),
+        ], 16 * GIB)
+        assert settings == {'vm.dirty_bytes': str(400 * MIB)}
+        assert [item['key'] for item in conflicts] == ['vm.dirty_ratio']
+
+    def test_background_threshold_at_or_above_blocking(self):
+        dummy, dummy, conflicts = resolve([
+            (PROFILE, {'vm.dirty_background_bytes': 100 * MIB}),
+            ('overrides', {'vm.dirty_ratio': 1}),
+        ], 4 * GIB)
+        assert [item['key'] for item in conflicts] == ['vm.dirty_background']
+
+    def test_default_above_limit(self):
+        dummy, dummy, conflicts = resolve([
+            (PROFILE, {}),
+            ('kvmhost_setup', {'net.core.rmem_default': 262144, 'net.core.rmem_max': 131072}),
+            ('overrides', {}),
+        ], 0)
+        assert [item['key'] for item in conflicts] == ['net.core.rmem_default']
+
+
+class TestRequestMode:
+
+    def request(self, host, source='kvmhost_base', settings=None, requests=None):
+        return dict(source=source, settings={'net.ipv4.ip_forward': 1} if settings is None else settings,
+                    requests=requests or [], apply=False, **host)
+
+    def write_dropin(self, host, **layers):
+        """Write the drop-in as a full apply would render it."""
+        order = [PROFILE] + list(layers) + ['overrides']
+        settings, sources, dummy = resolve(
+            [(PROFILE, profile_settings('throughput', 16 * GIB))] + list(layers.items()) + [('overrides', {})],
+            16 * GIB)
+        with open(host['path'], 'w') as f:
+            f.write(render('throughput', settings, sources, order))
+
+    def test_request_is_merged_into_the_fact(self, run_module, host):
+        earlier = [dict(source='kvmhost_setup', settings={'net.core.somaxconn': 1024}),
+                   dict(source='kvmhost_base', settings={'vm.swappiness': 5})]
+        result = run_module(**self.request(host, requests=earlier))
+        assert result['ansible_facts']['kvmhost_sysctl_requests'] == [
+            earlier[0], dict(source='kvmhost_base', settings={'net.ipv4.ip_forward': 1})]
+
+    def test_changed_without_drop_in(self, run_module, host):
+        assert run_module(**self.request(host))['changed'] is True
+
+    def test_unchanged_when_applied_with_another_profile_and_overrides(self, run_module, host):
+        # The drop-in holds profile, storage and override keys this request knows nothing about
+        with open(host['path'], 'w') as f:
+            f.write('# Managed by Ansible (sysctl_profile), profile latency\n\n'
+                    '# profile latency\nvm.swappiness = 1\nkernel.numa_balancing = 0\n\n'
+                    '# kvmhost_base\nnet.ipv4.ip_forward = 1\n\n'
+                    '# kvmhost_storage\nvm.dirty_ratio = 20\n\n'
+                    '# overrides\nvm.vfs_cache_pressure = 200\n')
+        set_running(host, 'net.ipv4.ip_forward', 1)
+        assert run_module(**self.request(host))['changed'] is False
+
+    def test_unchanged_when_the_full_render_matches(self, run_module, host):
+        self.write_dropin(host, kvmhost_base={'net.ipv4.ip_forward': 1})
+        set_running(host, 'net.ipv4.ip_forward', 1)
+        assert run_module(**self.request(host))['changed'] is False
+
+    def test_changed_when_the_drop_in_value_differs(self, run_module, host):
+        self.write_dropin(host, kvmhost_base={'net.ipv4.ip_forward': 0})
+        set_running(host, 'net.ipv4.ip_forward', 1)
+        assert run_module(**self.request(host))['changed'] is True
+
+    def test_changed_when_the_running_value_differs(self, run_module, host):
+        self.write_dropin(host, kvmhost_base={'net.ipv4.ip_forward': 1})
+        assert run_module(**self.request(host))['changed'] is True
+
+    def test_keys_missing_from_the_kernel_are_not_drift(self, run_module, host):
+        settings = {'net.ipv4.ip_forward': 1, 'net.bridge.bridge-nf-call-iptables': 0}
+        self.write_dropin(host, kvmhost_base=settings)
+        set_running(host, 'net.ipv4.ip_forward', 1)
+        assert run_module(**self.request(host, settings=settings))['changed'] is False
+
+    def test_changed_when_the_source_dropped_a_key(self, run_module, host):
+        self.write_dropin(host, kvmhost_setup={'net.core.somaxconn': 1024, 'net.core.netdev_max_backlog': 5000})
+        set_running(host, 'net.core.somaxconn', 1024)
+        result = run_module(**self.request(host, source='kvmhost_setup', settings={'net.core.somaxconn': 1024}))
+        assert result['changed'] is True
+
+    def test_unchanged_for_a_source_without_settings(self, run_module, host):
+        self.write_dropin(host, kvmhost_base={'net.ipv4.ip_forward': 1})
+        assert run_module(**self.request(host, source='kvmhost_setup', settings={}))['changed'] is False
+
+    def test_request_mode_does_not_write(self, run_module, host):
+        run_module(**self.request(host))
+        with pytest.raises(IOError):
+            open(host['path'])
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2025, Qubinode Project
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import annotations
+
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from ansible_collections.tosin2013.qubinode_kvmhost_setup_collection.plugins.modules.virt_net_dhcp_hosts import (
+    UPDATE_ADD_LAST,
+    UPDATE_DELETE,
+    UPDATE_MODIFY,
+    delta,
+)
+
+NETWORK = '''
+<network>
+  <name>qubinat</name>
+  <ip address="192.168.100.1" netmask="255.255.255.0">
+    <dhcp>
+      <range start="192.168.100.100" end="192.168.100.254"/>
+      <host mac="52:54:00:10:00:01" name="idm" ip="192.168.100.10"/>
+      <host mac="52:54:00:10:00:02" name="bastion" ip="192.168.100.11"/>
+    </dhcp>
+  </ip>
+  <ip family="ipv6" address="fd00:100::1" prefix="64">
+    <dhcp>
+      <host name="worker-v6" ip="fd00:100::20"/>
+    </dhcp>
+  </ip>
+</network>
+'''
+
+
+class FailJson(Exception):
+    pass
+
+
+class FakeModule:
+
+    def fail_json(self, **kwargs):
+        raise FailJson(kwargs['msg'])
+
+
+def host(mac, name, ip):
+    return dict(mac=mac, name=name, ip=ip)
+
+
+def keyed(*hosts):
+    return dict((item['mac'] or 'name:%s' % item['name'], item) for item in hosts)
+
+
+IDM = host('52:54:00:10:00:01', 'idm', '192.168.100.10')
+BASTION = host('52:54:00:10:00:02', 'bastion', '192.168.100.11')
+WORKER_V6 = host(None, 'worker-v6', 'fd00:100::20')
+
+
+@pytest.fixture
+def root():
+    return ET.fromstring(NETWORK)
+
+
+def test_no_updates_when_in_sync(root):
+    assert delta(FakeModule(), root, keyed(IDM, BASTION, WORKER_V6), True) == {}
+
+
+def test_add_to_the_subnet_of_the_address(root):
+    worker = host('52:54:00:10:00:20', 'worker-0', '192.168.100.20')
+    worker_v6 = host('52:54:00:10:00:21', 'worker-1', 'fd00:100::21')
+    assert delta(FakeModule(), root, keyed(IDM, BASTION, WORKER_V6, worker, worker_v6), True) == {
+        (UPDATE_ADD_LAST, 0, worker['mac']): worker,
+        (UPDATE_ADD_LAST, 1, worker_v6['mac']): worker_v6,
+    }
+
+
+def test_modify_name_or_address_in_place(root):
+    idm = host('52:54:00:10:00:01', 'idm', '192.168.100.12')
+    bastion = host('52:54:00:10:00:02', 'jump', '192.168.100.11')
+    assert delta(FakeModule(), root, keyed(idm, bastion, WORKER_V6), True) == {
+        (UPDATE_MODIFY, 0, idm['mac']): idm,
+        (UPDATE_MODIFY, 0, bastion['mac']): bastion,
+    }
+
+
+def test_mac_is_matched_case_insensitively():
+    root = ET.fromstring(NETWORK.replace('52:54:00:10:00:01', '52:54:00:10:00:01'.upper()))
+    assert delta(FakeModule(), root, keyed(IDM, BASTION, WORKER_V6), True) == {}
+
+
+def test_move_between_subnets_is_delete_and_add(root):
+    idm = host('52:54:00:10:00:01', 'idm', 'fd00:100::10')
+    assert delta(FakeModule(), root, keyed(idm, BASTION, WORKER_V6), True) == {
+        (UPDATE_DELETE, 0, idm['mac']): IDM,
+        (UPDATE_ADD_LAST, 1, idm['mac']): idm,
+    }
+
+
+def test_purge_removes_unlisted_hosts(root):
+    assert delta(FakeModule(), root, keyed(IDM), True) == {
+        (UPDATE_DELETE, 0, BASTION['mac']): BASTION,
+        (UPDATE_DELETE, 1, 'name:worker-v6'): WORKER_V6,
+    }
+
+
+def test_without_purge_unlisted_hosts_stay(root):
+    assert delta(FakeModule(), root, keyed(IDM), False) == {}
+
+
+def test_address_outside_every_subnet_fails(root):
+    stray = host('52:54:00:10:00:30', 'stray', '10.0.0.5')
+    with pytest.raises(FailJson, match='10.0.0.5 of 52:54:00:10:00:30 is not in any subnet'):
+        delta(FakeModule(), root, keyed(stray), False)